@@ -0,0 +1,43 @@
+"""Atomic file writes shared by every on-disk store.
+
+Each write goes to a temporary file next to its target, named uniquely per
+process, thread and write, and is moved into place with os.replace only once
+it is complete, so a crash or a concurrent reader never sees half a file and
+two writers never share a temporary file.
+
+  with atomic_open(path) as f:       # file-object writers (json.dump, pickle.dump)
+      json.dump(data, f)
+
+  with atomic_path(path) as tmp:     # path-based writers (pq.write_table, to_pickle)
+      df.to_pickle(tmp)
+"""
+
+import itertools
+import os
+import threading
+from contextlib import contextmanager
+
+_writes = itertools.count()
+
+
+@contextmanager
+def atomic_path(path):
+    """Yields a temporary path to write to, which replaces `path` if the block completes."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.{next(_writes)}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+@contextmanager
+def atomic_open(path, mode="w", **kwargs):
+    """Opens a temporary file for writing, which replaces `path` once closed without error."""
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, mode, **kwargs) as f:
+            yield f
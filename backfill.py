@@ -5,25 +5,41 @@ FPL-derived features (points_last_3, minutes_last_3, ICT index, etc.) are
 preserved from the existing X files since they were computed correctly during
 the season.  Understat and fixture-derived features are recomputed from
 currently-available APIs.
+
+Everything shared between gameweeks (Understat players and teams, goals
+conceded, the season fixture list and the FPL -> Understat name match) is
+fetched once up front; the gameweeks are then rebuilt in parallel processes.
+
+Usage:
+  python backfill.py [--workers N]
 """
 
 import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import pandas as pd
 
 sys.path.insert(0, os.path.dirname(__file__))
 from data_v3 import (
     TEAM_TEST_MAP,
     get_understat_player_stats,
-    get_fixtures,
+    get_understat_teams,
     get_opponent_goals_conceded,
-    get_gameweeks_seen,
+    get_season_opponents,
 )
+import feature_store
+from matching import match_players
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+# Feature-store season being rebuilt (2025/26)
+SEASON = "2025"
+# Max gameweeks rebuilt at once
+BACKFILL_WORKERS = os.cpu_count() or 4
 # Columns that come from FPL APIs (already correct in existing files, keep as-is)
 FPL_BASE_COLS = [
-    "full_name", "team_name", "player_position", "current_fpl_cost",
+    "player_id", "full_name", "team_name", "player_position", "current_fpl_cost",
     "points_last_3", "xg_last_3", "minutes_last_3",
     "is_penalty_taker", "ownership_percent",
     "influence", "creativity", "threat", "ict_index",
@@ -40,92 +56,89 @@ UNDERSTAT_TEAMS_2025 = [
 ]
 
 
-def rebuild_x(gameweek: int) -> pd.DataFrame:
-    """Rebuild X_{gw}.csv: keep FPL-derived cols from existing, refresh Understat + opponent stats."""
-    prev_path = os.path.join(DATA_DIR, f"X_{gameweek}.csv")
-    existing = pd.read_csv(prev_path)
-    print(f"  Read {prev_path} ({len(existing)} rows)")
-
-    df = existing[FPL_BASE_COLS].copy()
+def match_all_players(gameweeks, df_understat):
+    """
+    Matches every player in the given gameweeks to Understat in one batch.
+    Returns {player_id: Understat player_name}; a player's latest row decides the team block.
+    """
+    players = feature_store.load(
+        "X", gameweeks, ["player_id", "full_name", "team_name", "player_position"], season=SEASON
+    )
+    players = players.sort_values("gw", kind="stable").drop_duplicates(subset="player_id", keep="last")
+    players["team_name"] = players["team_name"].astype(str)
+    matches = match_players(players, df_understat, team_aliases=TEAM_TEST_MAP, position_col="player_position")
+    return dict(zip(players["player_id"], matches))
 
-    df_understat = get_understat_player_stats(season="2025")
 
-    # Temporarily use 2025/26 team list for Understat queries
-    import data_v3
-    _saved_teams = data_v3.UNDERSTAT_TEAMS
-    data_v3.UNDERSTAT_TEAMS = UNDERSTAT_TEAMS_2025
-    df_teams = data_v3.get_understat_teams(season="2025")
-    data_v3.UNDERSTAT_TEAMS = _saved_teams
+def prepare_shared(gameweeks):
+    """Fetches and normalizes everything the gameweeks share, once."""
+    print("Fetching Understat data (one-time)...")
+    df_understat = get_understat_player_stats(season=SEASON)
+    df_teams = get_understat_teams(season=SEASON, teams=UNDERSTAT_TEAMS_2025)
+    df_teams["team_name"] = df_teams["team_name"].replace(TEAM_TEST_MAP)
 
+    print("Fetching opponent goals conceded (one-time)...")
     df_goals_conceded = get_opponent_goals_conceded()
+    df_goals_conceded["team_name"] = df_goals_conceded["team_name"].replace(TEAM_TEST_MAP)
 
-    # Fuzzy match Understat names to FPL names
-    from thefuzz import process
-
-    understat_names = df_understat["player_name"].tolist()
-    fpl_names = df["full_name"].tolist()
-    mapping = {}
-    for name in fpl_names:
-        if pd.isna(name):
-            mapping[name] = None
-            continue
-        match, score = process.extractOne(name, understat_names)
-        mapping[name] = match if score >= 92 else None
-    df["_match"] = df["full_name"].map(mapping)
-    df = df.merge(
-        df_understat,
-        left_on="_match",
-        right_on="player_name",
-        how="inner",
-    ).drop(columns=["_match", "player_name"])
+    print("Fetching season fixtures (one-time)...")
+    opponents = get_season_opponents(gameweeks)
 
-    # Normalize team names
-    df["team_name"] = df["team_name"].replace(TEAM_TEST_MAP)
-    df_teams["team_name"] = df_teams["team_name"].replace(TEAM_TEST_MAP)
-    df_goals_conceded["team_name"] = df_goals_conceded["team_name"].replace(TEAM_TEST_MAP)
+    print(f"Matching players to Understat across {len(gameweeks)} gameweeks (one-time)...")
+    matches = match_all_players(gameweeks, df_understat)
 
-    # Merge team xG
-    df = df.merge(df_teams, on="team_name", how="left")
+    return {
+        "understat": df_understat,
+        "teams": df_teams,
+        "goals_conceded": df_goals_conceded,
+        "opponents": opponents,
+        "matches": matches,
+    }
 
-    # Compute opponent from fixtures
-    fixtures = get_fixtures(gameweek)
-    fixtures["home_team"] = fixtures["home_team"].replace(TEAM_TEST_MAP)
-    fixtures["away_team"] = fixtures["away_team"].replace(TEAM_TEST_MAP)
-    opponent_map = {}
-    for _, row in fixtures.iterrows():
-        opponent_map[row["home_team"]] = row["away_team"]
-        opponent_map[row["away_team"]] = row["home_team"]
-    df["opponent_team"] = df["team_name"].map(opponent_map)
 
-    # Merge opponent xG/xGA
-    df = df.merge(
-        df_teams[["team_name", "team_xg_per_90", "team_xg_against_per_90"]],
-        left_on="opponent_team",
-        right_on="team_name",
-        how="left",
-        suffixes=("", "_opp"),
-    )
+def rebuild_x(gameweek: int) -> pd.DataFrame:
+    """Rebuild GW X features: keep FPL-derived cols from existing, refresh Understat + opponent stats."""
+    return rebuild_x_single(gameweek, prepare_shared([gameweek]))
+
+
+def rebuild_x_single(gameweek, shared):
+    """Rebuild a single gameweek's X features using pre-fetched shared data."""
+    existing = feature_store.load("X", [gameweek], FPL_BASE_COLS, season=SEASON)
+
+    df = existing[FPL_BASE_COLS].copy()
+    df["team_name"] = df["team_name"].astype(str)
 
-    # Merge opponent goals conceded
+    df["_match"] = df["player_id"].map(shared["matches"])
     df = df.merge(
-        df_goals_conceded[["team_name", "goals_conceded_last_3"]],
-        left_on="opponent_team",
-        right_on="team_name",
-        how="left",
-        suffixes=("", "_opp_gc"),
-    )
+        shared["understat"],
+        left_on="_match",
+        right_on="player_name",
+        how="inner",
+    ).drop(columns=["_match", "player_name"])
 
-    # Rename opponent columns
-    df = df.rename(columns={
-        "team_xg_per_90_opp": "opponent_xg_per_90",
-        "team_xg_against_per_90_opp": "opponent_xg_against_per_90",
-        "goals_conceded_last_3": "opponent_goals_conceded_last_3",
-    })
+    df["team_name"] = df["team_name"].replace(TEAM_TEST_MAP)
 
-    df = df.loc[:, ~df.columns.duplicated()]
+    # Team and opponent lookups, keyed by normalized team name
+    teams = shared["teams"].drop_duplicates(subset="team_name").set_index("team_name")
+    goals = shared["goals_conceded"].drop_duplicates(subset="team_name").set_index("team_name")
+
+    # Existing X has one row per fixture, in get_fixture_sides order, so a player's k-th
+    # row this gameweek is their team's k-th fixture
+    sides = shared["opponents"]
+    sides = sides[sides["gameweek"] == gameweek]
+    sides = sides.assign(_n=sides.groupby("team_name").cumcount())
+    df["_n"] = df.groupby("player_id").cumcount()
+    df = df.merge(sides[["team_name", "_n", "opponent_team"]], on=["team_name", "_n"], how="left")
+    opponent = df["opponent_team"]
+
+    df["team_xg_per_90"] = df["team_name"].map(teams["team_xg_per_90"])
+    df["team_xg_against_per_90"] = df["team_name"].map(teams["team_xg_against_per_90"])
+    df["opponent_xg_per_90"] = opponent.map(teams["team_xg_per_90"])
+    df["opponent_xg_against_per_90"] = opponent.map(teams["team_xg_against_per_90"])
+    df["opponent_goals_conceded_last_3"] = opponent.map(goals["goals_conceded_last_3"])
 
     result = df[[
-        "full_name", "team_name", "player_position", "current_fpl_cost",
+        "player_id", "full_name", "team_name", "player_position", "current_fpl_cost",
         "playing_time_min_percentage", "xg_per_90", "xag_per_90",
         "yellows_per_90", "reds_per_90",
         "clearances_blocks_interceptions_per_90", "tackles_per_90",
@@ -139,115 +152,41 @@ def rebuild_x(gameweek: int) -> pd.DataFrame:
     return result
 
 
-def main():
-    gameweeks = get_gameweeks_seen(DATA_DIR)
-    print(f"Existing gameweeks in data/: {gameweeks}")
+_shared = None
 
-    # Pre-fetch shared data that doesn't change per gameweek
-    print("Fetching Understat data (one-time)...")
-    import data_v3
-    _saved_teams = data_v3.UNDERSTAT_TEAMS
-    data_v3.UNDERSTAT_TEAMS = UNDERSTAT_TEAMS_2025
-    df_understat = get_understat_player_stats(season="2025")
-    df_teams = data_v3.get_understat_teams(season="2025")
-    data_v3.UNDERSTAT_TEAMS = _saved_teams
 
-    df_teams["team_name"] = df_teams["team_name"].replace(TEAM_TEST_MAP)
+def _init_worker(shared):
+    global _shared
+    _shared = shared
 
-    print("Fetching opponent goals conceded (one-time)...")
-    df_goals_conceded = get_opponent_goals_conceded()
-    df_goals_conceded["team_name"] = df_goals_conceded["team_name"].replace(TEAM_TEST_MAP)
 
-    for gw in gameweeks:
-        print(f"\nRebuilding GW {gw}...")
-        x_df = rebuild_x_single(gw, df_understat, df_teams, df_goals_conceded)
-        out_path = os.path.join(DATA_DIR, f"X_{gw}.csv")
-        x_df.to_csv(out_path, index=False)
-        print(f"  Wrote {out_path} ({len(x_df)} players, {len(x_df.columns)} cols)")
+def _rebuild_and_write(gameweek):
+    """Process-pool task: rebuilds one gameweek from the worker's shared data and stores it."""
+    start = time.perf_counter()
+    x_df = rebuild_x_single(gameweek, _shared)
+    feature_store.write("X", x_df, SEASON, gameweek)
+    x_df.to_csv(os.path.join(DATA_DIR, f"X_{gameweek}.csv"), index=False)
+    return len(x_df), len(x_df.columns), time.perf_counter() - start
 
 
-def rebuild_x_single(gameweek, df_understat, df_teams, df_goals_conceded):
-    """Rebuild a single X file using pre-fetched shared data."""
-    prev_path = os.path.join(DATA_DIR, f"X_{gameweek}.csv")
-    existing = pd.read_csv(prev_path)
-    print(f"  Read {prev_path} ({len(existing)} rows)")
+def main(workers=BACKFILL_WORKERS):
+    gameweeks = list(feature_store.stored_gameweeks("X", season=SEASON))
+    print(f"Existing {SEASON} gameweeks in the feature store: {gameweeks}")
 
-    df = existing[FPL_BASE_COLS].copy()
+    start = time.perf_counter()
+    shared = prepare_shared(gameweeks)
 
-    from thefuzz import process
-
-    understat_names = df_understat["player_name"].tolist()
-    fpl_names = df["full_name"].tolist()
-    mapping = {}
-    for name in fpl_names:
-        if pd.isna(name):
-            mapping[name] = None
-            continue
-        match, score = process.extractOne(name, understat_names)
-        mapping[name] = match if score >= 92 else None
-    df["_match"] = df["full_name"].map(mapping)
-    df = df.merge(
-        df_understat,
-        left_on="_match",
-        right_on="player_name",
-        how="inner",
-    ).drop(columns=["_match", "player_name"])
+    print(f"\nRebuilding {len(gameweeks)} gameweeks on {workers} workers...")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared,)) as pool:
+        futures = {pool.submit(_rebuild_and_write, gw): gw for gw in gameweeks}
+        for i, future in enumerate(as_completed(futures), 1):
+            gw = futures[future]
+            rows, cols, seconds = future.result()
+            print(f"  [{i}/{len(gameweeks)}] GW {gw}: {rows} players, {cols} cols ({seconds:.1f}s)")
 
-    df["team_name"] = df["team_name"].replace(TEAM_TEST_MAP)
-
-    # Merge team xG
-    df = df.merge(df_teams, on="team_name", how="left")
-
-    # Compute opponent from per-GW fixtures
-    fixtures = get_fixtures(gameweek)
-    fixtures["home_team"] = fixtures["home_team"].replace(TEAM_TEST_MAP)
-    fixtures["away_team"] = fixtures["away_team"].replace(TEAM_TEST_MAP)
-    opponent_map = {}
-    for _, row in fixtures.iterrows():
-        opponent_map[row["home_team"]] = row["away_team"]
-        opponent_map[row["away_team"]] = row["home_team"]
-    df["opponent_team"] = df["team_name"].map(opponent_map)
-
-    # Merge opponent xG/xGA
-    df = df.merge(
-        df_teams[["team_name", "team_xg_per_90", "team_xg_against_per_90"]],
-        left_on="opponent_team",
-        right_on="team_name",
-        how="left",
-        suffixes=("", "_opp"),
-    )
-
-    # Merge opponent goals conceded
-    df = df.merge(
-        df_goals_conceded[["team_name", "goals_conceded_last_3"]],
-        left_on="opponent_team",
-        right_on="team_name",
-        how="left",
-        suffixes=("", "_opp_gc"),
-    )
-
-    df = df.rename(columns={
-        "team_xg_per_90_opp": "opponent_xg_per_90",
-        "team_xg_against_per_90_opp": "opponent_xg_against_per_90",
-        "goals_conceded_last_3": "opponent_goals_conceded_last_3",
-    })
-
-    df = df.loc[:, ~df.columns.duplicated()]
-
-    result = df[[
-        "full_name", "team_name", "player_position", "current_fpl_cost",
-        "playing_time_min_percentage", "xg_per_90", "xag_per_90",
-        "yellows_per_90", "reds_per_90",
-        "clearances_blocks_interceptions_per_90", "tackles_per_90",
-        "team_xg_per_90", "team_xg_against_per_90",
-        "opponent_xg_per_90", "opponent_xg_against_per_90", "opponent_league_position",
-        "gameweek", "is_at_home", "team_league_position",
-        "points_last_3", "xg_last_3", "minutes_last_3",
-        "is_penalty_taker", "opponent_goals_conceded_last_3", "ownership_percent",
-        "influence", "creativity", "threat", "ict_index",
-    ]]
-    return result
+    print(f"Rebuilt {len(gameweeks)} gameweeks in {time.perf_counter() - start:.1f}s")
 
 
 if __name__ == "__main__":
-    main()
+    workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else BACKFILL_WORKERS
+    main(workers)
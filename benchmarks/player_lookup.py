@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: per-player metadata lookup in the data_v3.py feature loops.
+
+Compares the old `players[players['id'] == pid].iloc[0]` boolean scan with the
+id-indexed records dict now used by get_fpl_defensive_stats and
+get_fpl_recent_stats, on a synthetic bootstrap-sized player table.
+
+Usage:
+  python benchmarks/player_lookup.py [n_players]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def make_players(n):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "first_name": [f"First{i}" for i in range(n)],
+        "second_name": [f"Second{i}" for i in range(n)],
+        "influence": rng.random(n).round(1).astype(str),
+        "creativity": rng.random(n).round(1).astype(str),
+        "threat": rng.random(n).round(1).astype(str),
+        "ict_index": rng.random(n).round(1).astype(str),
+        "penalties_order": rng.choice([np.nan, 1, 2, 3], n),
+        "selected_by_percent": rng.random(n).round(1).astype(str),
+    })
+
+
+def scan(players):
+    out = []
+    for pid in players["id"]:
+        player_info = players[players["id"] == pid].iloc[0]
+        out.append((f"{player_info['first_name']} {player_info['second_name']}",
+                    float(player_info.get("influence", 0))))
+    return out
+
+
+def indexed(players):
+    players_by_id = players.set_index("id", drop=False).to_dict("index")
+    out = []
+    for pid in players["id"]:
+        player_info = players_by_id[pid]
+        out.append((f"{player_info['first_name']} {player_info['second_name']}",
+                    float(player_info.get("influence", 0))))
+    return out
+
+
+def timed(fn, players, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(players)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 750
+    players = make_players(n)
+
+    t_scan, r_scan = timed(scan, players)
+    t_indexed, r_indexed = timed(indexed, players)
+    assert r_scan == r_indexed
+
+    print(f"{n} players")
+    print(f"  boolean scan per player : {t_scan * 1000:8.1f} ms")
+    print(f"  id-indexed records      : {t_indexed * 1000:8.1f} ms")
+    print(f"  speed-up                : {t_scan / t_indexed:8.1f}x")
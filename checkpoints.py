@@ -0,0 +1,70 @@
+"""Per-gameweek checkpoints of pipeline stage outputs.
+
+A collection run is split into named stages (see data_v3.join_it_all_together).
+Each completed stage's DataFrame is pickled to
+
+    .cache/checkpoints/<season>/gw<N>/<stage>.pkl
+
+so a run that dies part-way (e.g. on an Understat outage) can be re-run for
+the same gameweek and pick up from the stages it had already finished.
+Pickle rather than Parquet keeps every intermediate frame exactly as it was,
+object columns included.  A checkpoint is only reused while it is younger
+than CHECKPOINT_MAX_AGE (by file modification time), so a run retried the
+next day refetches prices, ownership and element summaries instead of
+resuming from a stale failed run.
+"""
+
+import os
+import shutil
+import time
+
+import pandas as pd
+
+from atomic import atomic_path
+
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "checkpoints")
+# Seconds a checkpoint stays reusable; the same freshness as cached element summaries
+CHECKPOINT_MAX_AGE = 6 * 60 * 60
+
+
+class Checkpoints:
+    def __init__(self, season, gameweek, root=CHECKPOINT_DIR, max_age=CHECKPOINT_MAX_AGE):
+        self.dir = os.path.join(root, str(season), f"gw{int(gameweek)}")
+        self.max_age = max_age
+
+    def path(self, name):
+        return os.path.join(self.dir, f"{name}.pkl")
+
+    def age(self, name):
+        """Seconds since stage `name` was checkpointed, or None if it never was."""
+        try:
+            return time.time() - os.path.getmtime(self.path(name))
+        except OSError:
+            return None
+
+    def has(self, name):
+        """True if stage `name` has a checkpoint young enough to reuse."""
+        age = self.age(name)
+        return age is not None and age < self.max_age
+
+    def load(self, name):
+        return pd.read_pickle(self.path(name))
+
+    def save(self, name, df):
+        with atomic_path(self.path(name)) as tmp_path:
+            df.to_pickle(tmp_path)
+
+    def run(self, name, compute):
+        """Returns the checkpointed output of stage `name`, running compute() only if there is none."""
+        if self.has(name):
+            print(f"  {name}: resumed from checkpoint")
+            return self.load(name)
+        if self.age(name) is not None:
+            print(f"  {name}: checkpoint older than {self.max_age / 3600:g}h, recomputing")
+        result = compute()
+        self.save(name, result)
+        return result
+
+    def clear(self):
+        """Drops this gameweek's checkpoints, e.g. once its X/y are safely written."""
+        shutil.rmtree(self.dir, ignore_errors=True)
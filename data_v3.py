@@ -1,13 +1,29 @@
 import re
-import requests
+import sys
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
-from thefuzz import process
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from understatapi import UnderstatClient
 
+import feature_store
+import snapshots
+from checkpoints import Checkpoints
+from stages import run_stages
+from fpl_api import fpl
+from http_cache import cache
+from matching import match_players
+from registry import UNDERSTAT_ALIASES, get_registry
+from rate_limit import REQUEST_TIMEOUT, limiter
+
 UNDERSTAT_SEASON = "2026"
 
+# Max Understat team pages fetched at once
+UNDERSTAT_WORKERS = 8
+
+# Half-lives (in matches) of the decayed goals scored/conceded columns in get_team_form
+FORM_HALFLIVES = (2, 5)
+
 TEAM_TEST_MAP = {
     "Manchester United": "Man Utd",
     "Manchester City": "Man City",
@@ -53,10 +69,7 @@ def get_next_gameweek():
     """
     Returns the next FPL gameweek number based on current date.
     """
-    url = "https://fantasy.premierleague.com/api/bootstrap-static/"
-    data = requests.get(url).json()
-
-    events = pd.DataFrame(data["events"])
+    events = fpl.events()
 
     next_gw = events.loc[events["is_next"], "id"]
 
@@ -65,22 +78,39 @@ def get_next_gameweek():
 
     return int(next_gw.iloc[0]) 
 
-curr_gameweek = get_next_gameweek()-1 # returns the actual current gameweek. If it is about to be 25, returns 25
+_curr_gameweek = None
+
+def get_current_gameweek():
+    """
+    Returns the actual current gameweek. If it is about to be 25, returns 25.
+    Looked up from the API on first use and cached; set_current_gameweek overrides it.
+    """
+    global _curr_gameweek
+    if _curr_gameweek is None:
+        _curr_gameweek = get_next_gameweek()-1
+    return _curr_gameweek
+
+def set_current_gameweek(gameweek):
+    """
+    Pins the current gameweek so nothing has to ask the API for it.
+    """
+    global _curr_gameweek
+    _curr_gameweek = gameweek
+
+def __getattr__(name):
+    # Keeps `data_v3.curr_gameweek` working without a network call at import
+    if name == "curr_gameweek":
+        return get_current_gameweek()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_fixtures(week_wanted):
     """
     Grabs the list of games for the specified gameweek from the FPL API.
     Returns DataFrame with home_team, away_team, and week columns.
     """
-    url = "https://fantasy.premierleague.com/api/bootstrap-static/"
-    data = requests.get(url).json()
-    
-    teams = pd.DataFrame(data["teams"])
-    team_map = dict(zip(teams["id"], teams["name"]))
+    team_map = fpl.team_names()
     
-    fixtures_url = "https://fantasy.premierleague.com/api/fixtures/"
-    fixtures_data = requests.get(fixtures_url).json()
-    fixtures = pd.DataFrame(fixtures_data)
+    fixtures = fpl.fixtures()
     
     fixtures = fixtures[fixtures["event"] == week_wanted]
     
@@ -91,22 +121,74 @@ def get_fixtures(week_wanted):
     return fixtures[["home_team", "away_team", "week"]]
 
 
-def get_fpl_defensive_stats():
+def get_fixture_sides(gameweeks=None):
+    """
+    One row per team per fixture from the season fixture list: team_id, opponent_id,
+    gameweek, is_at_home. A team gets two rows in a double gameweek and none in a blank.
+    Home sides come first, then away sides, each in fixture-list order; every builder of
+    X rows uses this order. gameweeks=None covers every scheduled fixture.
+    """
+    fixtures = fpl.fixtures()
+    fixtures = fixtures[fixtures['event'].notna()]
+    if gameweeks is not None:
+        fixtures = fixtures[fixtures['event'].isin(list(gameweeks))]
+
+    return pd.concat([
+        pd.DataFrame({'team_id': fixtures['team_h'], 'opponent_id': fixtures['team_a'],
+                      'gameweek': fixtures['event'], 'is_at_home': 1}),
+        pd.DataFrame({'team_id': fixtures['team_a'], 'opponent_id': fixtures['team_h'],
+                      'gameweek': fixtures['event'], 'is_at_home': 0}),
+    ], ignore_index=True)
+
+
+def get_season_opponents(gameweeks=None):
+    """
+    get_fixture_sides by team name: gameweek, team_name, opponent_team, is_at_home, one row
+    per team per fixture (team names normalized with TEAM_TEST_MAP).
+    """
+    team_names = {tid: TEAM_TEST_MAP.get(name, name) for tid, name in fpl.team_names().items()}
+    sides = get_fixture_sides(gameweeks)
+
+    return pd.DataFrame({
+        'gameweek': sides['gameweek'].astype(int).to_numpy(),
+        'team_name': sides['team_id'].map(team_names).to_numpy(),
+        'opponent_team': sides['opponent_id'].map(team_names).to_numpy(),
+        'is_at_home': sides['is_at_home'].to_numpy(),
+    })
+
+
+def get_player_ids(season=UNDERSTAT_SEASON):
+    """
+    Maps FPL element id -> registry player_id for every player in bootstrap-static,
+    registering players seen for the first time. Element ids are recorded under `season`.
+    """
+    players = fpl.players()
+    players['full_name'] = players['first_name'] + " " + players['second_name']
+
+    registry = get_registry()
+    player_ids = dict(zip(players['id'], registry.assign_ids(players, season=season)))
+    registry.save()
+
+    return player_ids
+
+
+def get_fpl_defensive_stats(season=UNDERSTAT_SEASON):
     """
     Gets tackles and clearances/blocks/interceptions per 90 for all FPL players from their season history.
+    FPL element ids resolve to player_ids under `season` (see get_player_ids).
     """
-    url = "https://fantasy.premierleague.com/api/bootstrap-static/"
-    response = requests.get(url)
-    data = response.json()
-    
-    players = pd.DataFrame(data['elements'])
+    players = fpl.players()
+    players_by_id = players.set_index('id', drop=False).to_dict('index')
+    player_ids = get_player_ids(season)
+    summaries = fpl.element_summaries(players['id'])
     
     defensive_stats = []
     
     for pid in players['id']:
+        if pid not in summaries:
+            continue
         try:
-            p_url = f"https://fantasy.premierleague.com/api/element-summary/{pid}/"
-            p_data = requests.get(p_url).json()
+            p_data = summaries[pid]
             
             history = p_data.get("history", [])
             
@@ -126,10 +208,11 @@ def get_fpl_defensive_stats():
                 tackles_per_90 = 0.0
             
             # Get player name
-            player_info = players[players['id'] == pid].iloc[0]
+            player_info = players_by_id[pid]
             full_name = f"{player_info['first_name']} {player_info['second_name']}"
             
             defensive_stats.append({
+                'player_id': player_ids[pid],
                 'full_name': full_name,
                 'clearances_blocks_interceptions_per_90': cbi_per_90,
                 'tackles_per_90': tackles_per_90,
@@ -143,30 +226,30 @@ def get_fpl_defensive_stats():
     return pd.DataFrame(defensive_stats)
 
 
-def get_fpl_recent_stats():
+def get_fpl_recent_stats(season=UNDERSTAT_SEASON):
     """
     Gets recent form stats (last 3 games) and ICT index for all FPL players.
     Returns: points_last_3, xg_last_3, minutes_last_3, is_penalty_taker, 
              ownership_percent, influence, creativity, threat, ict_index
+    FPL element ids resolve to player_ids under `season` (see get_player_ids).
     """
-    url = "https://fantasy.premierleague.com/api/bootstrap-static/"
-    response = requests.get(url)
-    data = response.json()
-    
-    players = pd.DataFrame(data['elements'])
-    teams = pd.DataFrame(data['teams'])
+    players = fpl.players()
+    players_by_id = players.set_index('id', drop=False).to_dict('index')
+    player_ids = get_player_ids(season)
+    summaries = fpl.element_summaries(players['id'])
     
     recent_stats = []
     
     for pid in players['id']:
+        if pid not in summaries:
+            continue
         try:
-            p_url = f"https://fantasy.premierleague.com/api/element-summary/{pid}/"
-            p_data = requests.get(p_url).json()
+            p_data = summaries[pid]
             
             history = p_data.get("history", [])
             
             # Get player info from bootstrap
-            player_info = players[players['id'] == pid].iloc[0]
+            player_info = players_by_id[pid]
             full_name = f"{player_info['first_name']} {player_info['second_name']}"
             
             # Get last 3 gameweeks stats
@@ -189,6 +272,7 @@ def get_fpl_recent_stats():
             ownership_percent = float(player_info.get('selected_by_percent', 0))
             
             recent_stats.append({
+                'player_id': player_ids[pid],
                 'full_name': full_name,
                 'points_last_3': points_last_3,
                 'xg_last_3': xg_last_3,
@@ -208,53 +292,86 @@ def get_fpl_recent_stats():
     return pd.DataFrame(recent_stats)
 
 
+def get_team_match_table(before_gameweek=None):
+    """
+    Melts finished fixtures into one row per team per match, most recent first within each team.
+    Columns: team_id, team_name, event, is_home, goals_scored, goals_conceded, match_rank
+    (0 = the team's latest match). before_gameweek keeps only matches from earlier gameweeks.
+    """
+    team_map = fpl.team_names()
+
+    fixtures = fpl.fixtures()
+    fixtures = fixtures[fixtures['finished'] == True]
+    if before_gameweek is not None:
+        fixtures = fixtures[fixtures['event'] < before_gameweek]
+
+    home = pd.DataFrame({
+        'team_id': fixtures['team_h'],
+        'event': fixtures['event'],
+        'is_home': 1,
+        'goals_scored': fixtures['team_h_score'],
+        'goals_conceded': fixtures['team_a_score'],
+    })
+    away = pd.DataFrame({
+        'team_id': fixtures['team_a'],
+        'event': fixtures['event'],
+        'is_home': 0,
+        'goals_scored': fixtures['team_a_score'],
+        'goals_conceded': fixtures['team_h_score'],
+    })
+
+    matches = pd.concat([home, away], ignore_index=True)
+    matches = matches.sort_values(['team_id', 'event'], ascending=[True, False], kind='stable')
+    matches['team_name'] = matches['team_id'].map(team_map)
+    matches['match_rank'] = matches.groupby('team_id').cumcount()
+
+    return matches[['team_id', 'team_name', 'event', 'is_home', 'goals_scored', 'goals_conceded', 'match_rank']]
+
+
+def get_team_form(window=3, halflives=FORM_HALFLIVES, before_gameweek=None):
+    """
+    Goals scored and conceded for every team from one pass over the team-match table.
+    goals_*_last_{window} are totals over each team's last `window` finished matches;
+    goals_*_ewm_{h} are per-match averages with weights halving every h matches back.
+    Teams without a finished match get zeros.
+    """
+    matches = get_team_match_table(before_gameweek)
+    teams = fpl.teams()[['id', 'name']].rename(columns={'id': 'team_id', 'name': 'team_name'})
+
+    recent = matches[matches['match_rank'] < window]
+    form = recent.groupby('team_id')[['goals_conceded', 'goals_scored']].sum()
+    form.columns = [f'goals_conceded_last_{window}', f'goals_scored_last_{window}']
+
+    for h in halflives:
+        weights = 0.5 ** (matches['match_rank'] / h)
+        weighted = matches[['goals_conceded', 'goals_scored']].mul(weights, axis=0)
+        weighted['weight'] = weights
+        sums = weighted.groupby(matches['team_id']).sum()
+        form[f'goals_conceded_ewm_{h}'] = sums['goals_conceded'] / sums['weight']
+        form[f'goals_scored_ewm_{h}'] = sums['goals_scored'] / sums['weight']
+
+    form = teams.merge(form, left_on='team_id', right_index=True, how='left')
+    return form.fillna(0)
+
+
 def get_opponent_goals_conceded():
     """
     Gets goals conceded in last 3 games for each team.
     """
-    url = "https://fantasy.premierleague.com/api/bootstrap-static/"
-    data = requests.get(url).json()
-    
-    teams = pd.DataFrame(data['teams'])
-    
-    fixtures_url = "https://fantasy.premierleague.com/api/fixtures/"
-    fixtures_data = requests.get(fixtures_url).json()
-    fixtures = pd.DataFrame(fixtures_data)
-    
-    # Filter for finished fixtures only
-    fixtures = fixtures[fixtures['finished'] == True]
-    
-    team_goals_conceded = []
-    
-    for team_id in teams['id']:
-        # Get last 3 fixtures for this team
-        team_fixtures = fixtures[
-            (fixtures['team_h'] == team_id) | (fixtures['team_a'] == team_id)
-        ].sort_values('event', ascending=False).head(3)
-        
-        goals_conceded = 0
-        for _, fixture in team_fixtures.iterrows():
-            if fixture['team_h'] == team_id:
-                goals_conceded += fixture['team_a_score']
-            else:
-                goals_conceded += fixture['team_h_score']
-        
-        team_name = teams[teams['id'] == team_id].iloc[0]['name']
-        
-        team_goals_conceded.append({
-            'team_name': team_name,
-            'goals_conceded_last_3': goals_conceded
-        })
-    
-    return pd.DataFrame(team_goals_conceded)
+    form = get_team_form(window=3, halflives=())
+
+    return form[['team_id', 'team_name', 'goals_conceded_last_3']]
 
 
 def get_understat_player_stats(season=UNDERSTAT_SEASON, pt_threshold=60):
     """
     grabs all player individual statistics that we want
     """
-    with UnderstatClient() as understat:
-        data = understat.league(league="EPL").get_player_data(season=season)
+    def fetch():
+        with UnderstatClient() as understat:
+            return understat.league(league="EPL").get_player_data(season=season, timeout=REQUEST_TIMEOUT)
+
+    data = cache.cached(f"understat/league/EPL/{season}", fetch, host="understat.com")
     
     df_understat = pd.DataFrame(data)
     
@@ -270,163 +387,101 @@ def get_understat_player_stats(season=UNDERSTAT_SEASON, pt_threshold=60):
 
     df_understat = df_understat[df_understat['playing_time_min_percentage'] >= pt_threshold]
     
-    name_mapping = {
-        'Alejandro Garnacho': 'Alejandro Garnacho Ferreyra',
-        'Alejandro Jiménez': 'Alex Jiminez Sanchez',
-        'Alisson': 'Alisson Becker',
-        'Altay Bayindir': 'Altay Bayındır',
-        'Amad Diallo Traore': 'Amad Diallo',
-        'André': 'André Trindade da Costa Neto',
-        'Ben White': 'Benjamin White',
-        'Bernardo Silva': 'Bernardo Mota Veiga de Carvalho e Silva',
-        'Bruno Guimarães': 'Bruno Guimarães Rodriguez Moura',
-        'Casemiro': 'Carlos Henrique Casimiro',
-        'Chimuanya Ugochukwu': 'Lesley Ugochukwu',
-        'Dan Ballard': 'Daniel Ballard',
-        'David Raya': 'David Raya Martín',
-        'Diego Gómez': 'Diego Gómez Amarilla',
-        'Diogo Dalot': 'Diogo Dalot Teixeira',
-        'Djordje Petrovic': 'Đorđe Petrović',
-        'Emiliano Martinez': 'Emiliano Martínez Romero',
-        'Evanilson': 'Francisco Evanilson de Lima Barbosa',
-        'Ferdi Kadioglu': 'Ferdi Kadıoğlu',
-        'Florentino Luís': 'Florentino Ibrain Morris Luís',
-        'Gabriel': 'Gabriel dos Santos Magalhães',
-        'Hugo Bueno': 'Hugo Bueno López',
-        'Igor Jesus': 'Igor Jesus Maciel da Cruz',
-        'Iyenoma Destiny Udogie': 'Destiny Udogie',
-        'Jair': 'Jair Paula da Cunha Filho',
-        'Joelinton': 'Joelinton Cássio Apolinário de Lira',
-        'John Victor': 'John Victor Maciel Furtado',
-        'Jorge Cuenca': 'Jorge Cuenca Barreno',
-        'José Sá': 'José Malheiro de Sá',
-        'João Gomes': 'Gustavo Nunes Fernandes Gomes',
-        'João Palhinha': 'João Maria Lobo Alves Palhares Costa Palhinha Gonçalves',
-        'João Pedro': 'João Pedro Junqueira de Jesus',
-        'Lucas Paquetá': 'Lucas Tolentino Coelho de Lima',
-        'Lucas Perri': 'Lucas Estella Perri',
-        'Lucas Pires': 'Lucas Pires Silva',
-        'Marc Cucurella': 'Marc Cucurella Saseta',
-        'Mateus Fernandes': 'Mateus Gonçalo Espanha Fernandes',
-        'Matheus Cunha': 'Matheus Santos Carneiro da Cunha',
-        'Matthew Cash': 'Matty Cash',
-        'Max Kilman': 'Maximilian Kilman',
-        'Moisés Caicedo': 'Moisés Caicedo Corozo',
-        'Morato': 'Felipe Rodrigues Da Silva',
-        'Murillo': 'Murillo Costa dos Santos',
-        'Naif Aguerd': 'Nayef Aguerd',
-        'Nico González': 'Nico González Iglesias',
-        'Oliver Scarles': 'Ollie Scarles',
-        'Pablo': 'Pablo Felipe Pereira de Jesus',
-        'Pedro Neto': 'Pedro Lomba Neto',
-        'Pedro Porro': 'Pedro Porro Sauceda',
-        'Raúl Jiménez': 'Raúl Jiménez Rodríguez',
-        'Reinildo': 'Reinildo Mandava',
-        'Richarlison': 'Richarlison de Andrade',
-        'Rodri': "Rodrigo 'Rodri'Hernandez Cascante",
-        'Rúben Dias': 'Rúben dos Santos Gato Alves Dias',
-        'Santiago Bueno': 'Santiago Ignacio Bueno',
-        'Sasa Lukic': 'Saša Lukić',
-        'Thiago': 'Igor Thiago Nascimento Rodrigues',
-        'Toti': 'Toti Gomes',
-        'Valentino Livramento': 'Tino Livramento',
-        'Yeremi Pino': 'Yéremy Pino Santos',
-        'Yerson Mosquera': 'Yerson Mosquera Valdelamar'
-    }
-    
-    df_understat['player_name'] = df_understat['player_name'].replace(name_mapping)
+    df_understat['player_name'] = df_understat['player_name'].replace(UNDERSTAT_ALIASES)
     
-    return df_understat[['player_name','playing_time_min_percentage','xg_per_90','xag_per_90','yellows_per_90','reds_per_90']] 
+    df_understat = df_understat.rename(columns={'id': 'understat_id', 'team_title': 'understat_team', 'position': 'understat_position'})
 
-def get_understat_teams(season=UNDERSTAT_SEASON):
+    return df_understat[['player_name','playing_time_min_percentage','xg_per_90','xag_per_90','yellows_per_90','reds_per_90',
+                         'understat_id','understat_team','understat_position']]
+
+def get_understat_teams(season=UNDERSTAT_SEASON, teams=None):
     """
     Returns xG statistics for all Premier League teams for games up to today.
+    All teams are fetched concurrently through one Understat client; teams defaults to UNDERSTAT_TEAMS.
     """
-
-    teams_data = []
+    if teams is None:
+        teams = UNDERSTAT_TEAMS
 
     today = datetime.now()
 
-    for team_name in UNDERSTAT_TEAMS:
-        try:
-            with UnderstatClient() as understat:
-                team_data = understat.team(team=team_name).get_match_data(season=season)
-            
-            df_team = pd.DataFrame(team_data)
-            
-            df_team['datetime'] = pd.to_datetime(df_team['datetime'])
-            
-            df_team = df_team[df_team['datetime'] < today]
-            df_team = df_team[df_team['isResult'] == True]  
-            
-            if len(df_team) == 0:
-                continue
-            
-            df_team['team_xg'] = df_team.apply(
-                lambda row: float(row['xG']['h']) if row['side'] == 'h' else float(row['xG']['a']), 
-                axis=1
-            )
-            df_team['team_xg_against'] = df_team.apply(
-                lambda row: float(row['xG']['a']) if row['side'] == 'h' else float(row['xG']['h']), 
-                axis=1
+    match_data = {}
+
+    with UnderstatClient() as understat:
+        def fetch(team_name):
+            return cache.cached(
+                f"understat/team/{team_name}/{season}",
+                lambda: understat.team(team=team_name).get_match_data(season=season, timeout=REQUEST_TIMEOUT),
+                host="understat.com",
             )
-            
-            total_minutes = len(df_team) * 90
-            
-            team_xg_per_90 = (df_team['team_xg'].sum() / total_minutes * 90).round(2)
-            team_xg_against_per_90 = (df_team['team_xg_against'].sum() / total_minutes * 90).round(2)
-            
-            teams_data.append({
-                'team_name': team_name,
-                'team_xg_per_90': team_xg_per_90,
-                'team_xg_against_per_90': team_xg_against_per_90,
-                'matches_played': len(df_team)
-            })
-            
-        except Exception as e:
-            print(f"Error processing {team_name}: {e}")
-            continue
-    
-    return pd.DataFrame(teams_data)
 
-def get_fpl_players():
+        with ThreadPoolExecutor(max_workers=UNDERSTAT_WORKERS) as pool:
+            futures = {pool.submit(fetch, team_name): team_name for team_name in teams}
+            for future in as_completed(futures):
+                team_name = futures[future]
+                try:
+                    match_data[team_name] = future.result()
+                except Exception as e:
+                    print(f"Error processing {team_name}: {e}")
+
+    frames = [
+        pd.DataFrame(match_data[team_name]).assign(team_name=team_name)
+        for team_name in teams
+        if match_data.get(team_name)
+    ]
+    columns = ['team_name', 'team_xg_per_90', 'team_xg_against_per_90', 'matches_played']
+    if not frames:
+        return pd.DataFrame(columns=columns)
+
+    df = pd.concat(frames, ignore_index=True)
+
+    df['datetime'] = pd.to_datetime(df['datetime'])
+    df = df[(df['datetime'] < today) & (df['isResult'] == True)]
+    # e.g. before kickoff: no team has a finished match yet
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    # xG is a {'h': ..., 'a': ...} dict per match; split it into columns and pick by side
+    xg = pd.DataFrame(df['xG'].tolist(), index=df.index).astype(float)
+    is_home = df['side'] == 'h'
+    df = df.assign(
+        team_xg=xg['h'].where(is_home, xg['a']),
+        team_xg_against=xg['a'].where(is_home, xg['h']),
+    )
+
+    teams_data = df.groupby('team_name', sort=False).agg(
+        team_xg=('team_xg', 'sum'),
+        team_xg_against=('team_xg_against', 'sum'),
+        matches_played=('team_xg', 'size'),
+    ).reset_index()
+
+    total_minutes = teams_data['matches_played'] * 90
+
+    teams_data['team_xg_per_90'] = (teams_data['team_xg'] / total_minutes * 90).round(2)
+    teams_data['team_xg_against_per_90'] = (teams_data['team_xg_against'] / total_minutes * 90).round(2)
+
+    return teams_data[columns]
+
+def get_fpl_players(season=UNDERSTAT_SEASON):
     """
     Grabs a list of all FPL players
     """
-    url = "https://fantasy.premierleague.com/api/bootstrap-static/"
-    response = requests.get(url)
-    data = response.json()
-    
-    players = pd.DataFrame(data['elements'])
-    teams = {team['id']: team['name'] for team in data['teams']}
-    players['team_name'] = players['team'].map(teams)
-    
-    positions = {pos['id']: pos['singular_name'] for pos in data['element_types']}
-    players['position'] = players['element_type'].map(positions)
+    players = fpl.players()
+    players['team_name'] = players['team'].map(fpl.team_names())
+    players['position'] = players['element_type'].map(fpl.position_names())
     
-    players_df = players[['id', 'first_name', 'second_name', 'team_name', 'position', 'now_cost']].copy()
+    players_df = players[['id', 'first_name', 'second_name', 'team', 'team_name', 'position', 'now_cost']].copy()
+    players_df = players_df.rename(columns={'team': 'team_id'})
     players_df['full_name'] = players_df['first_name'] + " " + players_df['second_name']
+    players_df['player_id'] = players_df['id'].map(get_player_ids(season))
     
     return players_df
 
 def fuzzy_match(fpl_df, understat_df, threshold=92):
     """
-    Fuzzy matches FPL players to Understat player stats by name
+    Fuzzy matches FPL players to Understat player stats by name (see matching.match_players)
     """
     
-    understat_names = understat_df['player_name'].tolist()
-    
-    fpl_names = fpl_df['full_name'].tolist()
-
-    mapping = {}
-    for name in fpl_names:
-        if pd.isna(name):
-            mapping[name] = None
-            continue
-        match, score = process.extractOne(name, understat_names)
-        mapping[name] = match if score >= threshold else None
-
-    fpl_df['matched_understat'] = fpl_df['full_name'].map(mapping)
+    fpl_df['matched_understat'] = match_players(fpl_df, understat_df, threshold, team_aliases=TEAM_TEST_MAP)
 
     merged = fpl_df.merge(understat_df, left_on='matched_understat', right_on='player_name', how='inner')
 
@@ -437,16 +492,16 @@ def fuzzy_match(fpl_df, understat_df, threshold=92):
 
 def get_fpl_table():
     """Pulls current PL standings from the official FPL API."""
-    url = "https://fantasy.premierleague.com/api/bootstrap-static/"
-    data = requests.get(url).json()
-
-    teams = pd.DataFrame(data["teams"])[["name", "short_name", "position"]]
+    teams = fpl.teams()[["name", "short_name", "position"]]
 
     teams["team_name"] = teams["name"].replace(TEAM_TEST_MAP)
 
     return teams[["team_name", "position"]]
 
-def get_fixtures_and_league_spots(gameweek=curr_gameweek):
+def get_fixtures_and_league_spots(gameweek=None):
+    if gameweek is None:
+        gameweek = get_current_gameweek()
+
     fixtures = get_fixtures(gameweek)
 
     fixtures['home_team'] = fixtures['home_team'].replace(TEAM_TEST_MAP)
@@ -467,82 +522,105 @@ def get_fixtures_and_league_spots(gameweek=curr_gameweek):
 
     return final.sort_values("position")
 
-def join_it_all_together():
-    df_fpl = get_fpl_players()
-    df_understat = get_understat_player_stats()
-    df_teams = get_understat_teams()
-    df_defensive = get_fpl_defensive_stats()
-    df_recent = get_fpl_recent_stats()
-    df_goals_conceded = get_opponent_goals_conceded()
-    
-    df_fuz = fuzzy_match(df_fpl, df_understat)
+def join_stages(gameweek, season=UNDERSTAT_SEASON, understat_teams=None):
+    """
+    The named stages of join_it_all_together as (name, deps, function) triples.
+    Each function takes the dict of finished stage outputs and returns a DataFrame;
+    the six source fetches depend on nothing and run concurrently (see stages.py).
+    """
+    return [
+        ('fpl_players', [], lambda done: get_fpl_players(season)),
+        ('understat_players', [], lambda done: get_understat_player_stats(season)),
+        ('understat_teams', [], lambda done: get_understat_teams(season, understat_teams)),
+        ('defensive', [], lambda done: get_fpl_defensive_stats(season)),
+        ('recent', [], lambda done: get_fpl_recent_stats(season)),
+        ('goals_conceded', [], lambda done: get_opponent_goals_conceded()),
+        ('matched', ['fpl_players', 'understat_players'],
+         lambda done: fuzzy_match(done['fpl_players'], done['understat_players'])),
+        ('features', ['matched', 'defensive', 'recent', 'understat_teams', 'goals_conceded'],
+         lambda done: build_features(
+             done['matched'], done['defensive'], done['recent'],
+             done['understat_teams'], done['goals_conceded'], gameweek,
+         )),
+    ]
+
+
+def join_it_all_together(gameweek=None, checkpoints=None, season=UNDERSTAT_SEASON, understat_teams=None):
+    """
+    Builds the X rows for a gameweek from the stages in join_stages, running independent
+    stages in parallel. With a checkpoints.Checkpoints, finished stages are saved as they
+    complete and reused on a re-run, so a failed run resumes where it stopped.
+    season picks the Understat season and the registry season of FPL element ids.
+    """
+    if gameweek is None:
+        gameweek = get_current_gameweek()
 
-    df_fuz = df_fuz.merge(df_defensive, on='full_name', how='left')
-    df_fuz = df_fuz.merge(df_recent, on='full_name', how='left')
+    return run_stages(join_stages(gameweek, season, understat_teams), checkpoints)['features']
 
-    df_fuz["team_name"] = df_fuz["team_name"].replace(TEAM_TEST_MAP)
-    df_teams["team_name"] = df_teams["team_name"].replace(TEAM_TEST_MAP)
-    df_goals_conceded["team_name"] = df_goals_conceded["team_name"].replace(TEAM_TEST_MAP)
-    
-    df = df_fuz.merge(df_teams, left_on="team_name", right_on="team_name", how="left")
 
-    df_fix = get_fixtures_and_league_spots() 
+def get_team_table(df_teams, df_goals_conceded):
+    """
+    One row per FPL team, indexed by FPL team id: the normalized team_name, league position,
+    Understat xG for/against per 90 and goals conceded over the last 3 matches.
+    Understat rows are matched on the normalized name; everything else joins on the id.
+    """
+    teams = fpl.teams().set_index('id')
+    table = pd.DataFrame({
+        'team_name': teams['name'].replace(TEAM_TEST_MAP),
+        'league_position': teams['position'],
+    }, index=teams.index)
+
+    xg = df_teams.assign(team_name=df_teams['team_name'].replace(TEAM_TEST_MAP))
+    xg = xg.drop_duplicates(subset='team_name').set_index('team_name')
+    table['team_xg_per_90'] = table['team_name'].map(xg['team_xg_per_90'])
+    table['team_xg_against_per_90'] = table['team_name'].map(xg['team_xg_against_per_90'])
 
-    df = df.merge(df_fix, left_on='team_name', right_on='team', how='left')
-    
-    fixtures = get_fixtures(curr_gameweek)
-    fixtures['home_team'] = fixtures['home_team'].replace(TEAM_TEST_MAP)
-    fixtures['away_team'] = fixtures['away_team'].replace(TEAM_TEST_MAP)
-    
-    opponent_map = {}
-    for _, row in fixtures.iterrows():
-        opponent_map[row['home_team']] = row['away_team']
-        opponent_map[row['away_team']] = row['home_team']
-    
-    df['opponent_team'] = df['team_name'].map(opponent_map)
-    
-    df = df.merge(
-        df_teams[['team_name', 'team_xg_per_90', 'team_xg_against_per_90']],
-        left_on='opponent_team',
-        right_on='team_name',
-        how='left',
-        suffixes=('', '_opp')
-    )
-    
-    # Merge opponent goals conceded
-    df = df.merge(
-        df_goals_conceded[['team_name', 'goals_conceded_last_3']],
-        left_on='opponent_team',
-        right_on='team_name',
-        how='left',
-        suffixes=('', '_opp_gc')
-    )
-    
-    standings = get_fpl_table()
-    df = df.merge(
-        standings[['team_name', 'position']],
-        left_on='opponent_team',
-        right_on='team_name',
-        how='left',
-        suffixes=('', '_opp_pos')
+    goals = df_goals_conceded.set_index('team_id')['goals_conceded_last_3']
+    table['goals_conceded_last_3'] = goals.reindex(table.index)
+
+    return table
+
+
+def get_team_fixtures(gameweek, team_table):
+    """
+    One row per team per fixture in a gameweek (two for a double gameweek, none for a blank),
+    with the team's and opponent's features looked up from team_table by id.
+    """
+    sides = get_fixture_sides([gameweek])
+
+    own = team_table.loc[sides['team_id']]
+    opp = team_table.loc[sides['opponent_id']]
+    return sides.assign(
+        team_league_position=own['league_position'].to_numpy(),
+        opponent_league_position=opp['league_position'].to_numpy(),
+        opponent_xg_per_90=opp['team_xg_per_90'].to_numpy(),
+        opponent_xg_against_per_90=opp['team_xg_against_per_90'].to_numpy(),
+        opponent_goals_conceded_last_3=opp['goals_conceded_last_3'].to_numpy(),
     )
 
+
+def build_features(df_fuz, df_defensive, df_recent, df_teams, df_goals_conceded, gameweek):
+    """
+    Joins the matched players with their FPL stats, then adds own-team features by team id
+    lookup and fixture/opponent features with one join on team id.
+    """
+    df = df_fuz.merge(df_defensive.drop(columns=['full_name']), on='player_id', how='left')
+    df = df.merge(df_recent.drop(columns=['full_name']), on='player_id', how='left')
+
+    team_table = get_team_table(df_teams, df_goals_conceded)
+    own = team_table.loc[df['team_id']]
+    df['team_name'] = own['team_name'].to_numpy()
+    df['team_xg_per_90'] = own['team_xg_per_90'].to_numpy()
+    df['team_xg_against_per_90'] = own['team_xg_against_per_90'].to_numpy()
+
+    df = df.merge(get_team_fixtures(gameweek, team_table).drop(columns=['opponent_id']), on='team_id', how='left')
+
     df = df.rename(columns={
-        'team_name': 'team_name',
-        'position_x': 'player_position',
+        'position': 'player_position',
         'now_cost': 'current_fpl_cost',
-        'week': 'gameweek',
-        'home': 'is_at_home',
-        'position_y': 'team_league_position',
-        'team_xg_per_90_opp': 'opponent_xg_per_90',
-        'team_xg_against_per_90_opp': 'opponent_xg_against_per_90',
-        'position': 'opponent_league_position',
-        'goals_conceded_last_3': 'opponent_goals_conceded_last_3'
     })
-    
-    df = df.loc[:, ~df.columns.duplicated()]
 
-    return df[['full_name', 'team_name', 'player_position', 'current_fpl_cost',
+    return df[['player_id', 'full_name', 'team_name', 'player_position', 'current_fpl_cost',
                'playing_time_min_percentage', 'xg_per_90', 'xag_per_90',
                'yellows_per_90', 'reds_per_90',
                'clearances_blocks_interceptions_per_90', 'tackles_per_90',
@@ -554,59 +632,74 @@ def join_it_all_together():
                'influence', 'creativity', 'threat', 'ict_index']]
 
 
-def get_players_with_points(gameweek=curr_gameweek-1):
+def get_players_with_points(gameweek=None, season=UNDERSTAT_SEASON):
     """
-    Returns FPL players + their total points and minutes for a specific gameweek.
+    Returns FPL players + their total points and minutes for a specific gameweek,
+    taken from the single event-live response for that gameweek.
+    Defaults to the gameweek before the current one.
     """
-    url = "https://fantasy.premierleague.com/api/bootstrap-static/"
-    response = requests.get(url)
-    data = response.json()
-
-    players = pd.DataFrame(data['elements'])
-    teams = {team['id']: team['name'] for team in data['teams']}
-    players['team_name'] = players['team'].map(teams)
+    if gameweek is None:
+        gameweek = get_current_gameweek()-1
 
-    positions = {pos['id']: pos['singular_name'] for pos in data['element_types']}
-    players['position'] = players['element_type'].map(positions)
+    players = fpl.players()
+    players['team_name'] = players['team'].map(fpl.team_names())
+    players['position'] = players['element_type'].map(fpl.position_names())
 
     players_df = players[['id', 'first_name', 'second_name', 'team_name', 'position', 'now_cost']].copy()
     players_df['full_name'] = players_df['first_name'] + " " + players_df['second_name']
+    players_df['player_id'] = players_df['id'].map(get_player_ids(season))
 
-    points_list = []
-    minutes_list = []
-    
-    for pid in players_df['id']:
-        p_url = f"https://fantasy.premierleague.com/api/element-summary/{pid}/"
-        p_data = requests.get(p_url).json()
-
-        history = p_data.get("history", [])
-        gw_record = next((gw for gw in history if gw["round"] == gameweek), None)
-
-        if gw_record:
-            points_list.append(gw_record["total_points"])
-            minutes_list.append(gw_record["minutes"])
-        else:
-            points_list.append(0)
-            minutes_list.append(0)
-
-    players_df["gw_points"] = points_list
-    players_df["gw_minutes"] = minutes_list
+    live = fpl.event_live(gameweek)
+
+    players_df = players_df.merge(live, on='id', how='left')
+    players_df[['gw_points', 'gw_minutes']] = players_df[['gw_points', 'gw_minutes']].fillna(0).astype(int)
     
-    return players_df[['full_name', 'gw_points', 'gw_minutes']]
+    return players_df[['player_id', 'full_name', 'gw_points', 'gw_minutes']]
+
+
+def collect_gameweek(gameweek, checkpoints=None, season=UNDERSTAT_SEASON, understat_teams=None):
+    """
+    Returns (X, y) for a collection run at `gameweek`: the features for `gameweek` and the
+    points of the gameweek before it, limited to the players in X. y is None for GW 1,
+    which has no gameweek before it. season and understat_teams default to the current
+    season's; snapshot rebuilds pass the snapshot's own.
+    """
+    X = join_it_all_together(gameweek, checkpoints, season, understat_teams)
+    if gameweek - 1 < 1:
+        return X, None
+    df_ = get_players_with_points(gameweek-1, season)
+    y = df_[df_['player_id'].isin(X['player_id'])]
+    return X, y
 
 
 if __name__ == "__main__":
+    # Archive every raw payload of this run so its features can be rebuilt offline (snapshots.py)
+    archive = snapshots.archive_run(UNDERSTAT_SEASON)
+
+    # python data_v3.py [--gameweek N] [--restart]
+    # --gameweek pins the gameweek instead of asking the API; --restart ignores checkpoints
+    if "--gameweek" in sys.argv:
+        set_current_gameweek(int(sys.argv[sys.argv.index("--gameweek") + 1]))
+
+    curr_gameweek = get_current_gameweek()
     print("The current gameweek is: ", curr_gameweek)
 
-    gameweeks_seen = get_gameweeks_seen("/home/tars/Projects/fpl-oracle/data")
+    gameweeks_seen = feature_store.stored_gameweeks("X", season=UNDERSTAT_SEASON)
 
     if curr_gameweek in gameweeks_seen:
         print("The gameweek has already been grabbed.")
     else:
-        df = join_it_all_together()
+        archive.gameweeks = [curr_gameweek]
+        # Stages finished by an earlier, failed run for this gameweek are reused
+        checkpoints = Checkpoints(UNDERSTAT_SEASON, curr_gameweek)
+        if "--restart" in sys.argv:
+            checkpoints.clear()
+        df, filtered = collect_gameweek(curr_gameweek, checkpoints)
+        feature_store.write("X", df, UNDERSTAT_SEASON, curr_gameweek)
         df.to_csv(f'/home/tars/Projects/fpl-oracle/data/X_{curr_gameweek}.csv', index=False)
+        if filtered is not None:
+            feature_store.write("y", filtered, UNDERSTAT_SEASON, curr_gameweek-1)
+            filtered.to_csv(f'/home/tars/Projects/fpl-oracle/data/y_{curr_gameweek-1}.csv', index=False)
+        checkpoints.clear()
 
-        df_ = get_players_with_points()
-        X = pd.read_csv(f"/home/tars/Projects/fpl-oracle/data/X_{curr_gameweek}.csv")
-        filtered = df_[df_['full_name'].isin(X['full_name'])]
-        filtered.to_csv(f'/home/tars/Projects/fpl-oracle/data/y_{curr_gameweek-1}.csv', index=False)
+    print("Requests:", limiter.report())
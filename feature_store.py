@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""Columnar store for the per-gameweek feature (X) and target (y) tables.
+
+Each table is a Parquet dataset under data/store/, hive-partitioned by season
+and gameweek:
+
+  data/store/X/season=2026/gw=5/part-0.parquet
+  data/store/y/season=2025/gw=36/part-0.parquet
+
+Columns are written with a fixed schema (X_SCHEMA / Y_SCHEMA), with team and
+position stored as dictionary (categorical) columns.  The partition key is
+called `gw` because X already has a `gameweek` column (the fixture's
+gameweek, empty for blanks).
+
+`load` reads any set of columns for any set of gameweeks in one dataset scan.
+When no season is given, each gameweek number resolves to the latest season
+that holds it, like the old flat data/X_<gw>.csv layout did.  The collection
+scripts still write data/X_<gw>.csv and y_<gw>.csv as a readable copy, but the
+model and optimizer only read the store.
+
+Usage:
+  python feature_store.py import <season> [first-last]   # load data/X_*.csv, y_*.csv into the store
+  python feature_store.py list                           # show stored partitions
+"""
+
+import hashlib
+import os
+import re
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from atomic import atomic_path
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+STORE_DIR = os.path.join(DATA_DIR, "store")
+
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+X_SCHEMA = pa.schema([
+    ("player_id", pa.int32()),
+    ("full_name", pa.string()),
+    ("team_name", CATEGORY),
+    ("player_position", CATEGORY),
+    ("current_fpl_cost", pa.int16()),
+    ("playing_time_min_percentage", pa.float64()),
+    ("xg_per_90", pa.float64()),
+    ("xag_per_90", pa.float64()),
+    ("yellows_per_90", pa.float64()),
+    ("reds_per_90", pa.float64()),
+    ("clearances_blocks_interceptions_per_90", pa.float64()),
+    ("tackles_per_90", pa.float64()),
+    ("team_xg_per_90", pa.float64()),
+    ("team_xg_against_per_90", pa.float64()),
+    ("opponent_xg_per_90", pa.float64()),
+    ("opponent_xg_against_per_90", pa.float64()),
+    ("opponent_league_position", pa.int8()),
+    ("gameweek", pa.int8()),
+    ("is_at_home", pa.int8()),
+    ("team_league_position", pa.int8()),
+    ("points_last_3", pa.int16()),
+    ("xg_last_3", pa.float64()),
+    ("minutes_last_3", pa.int16()),
+    ("is_penalty_taker", pa.int8()),
+    ("opponent_goals_conceded_last_3", pa.float64()),
+    ("ownership_percent", pa.float64()),
+    ("influence", pa.float64()),
+    ("creativity", pa.float64()),
+    ("threat", pa.float64()),
+    ("ict_index", pa.float64()),
+])
+
+Y_SCHEMA = pa.schema([
+    ("player_id", pa.int32()),
+    ("full_name", pa.string()),
+    ("gw_points", pa.int16()),
+    ("gw_minutes", pa.int16()),
+])
+
+SCHEMAS = {"X": X_SCHEMA, "y": Y_SCHEMA}
+
+PARTITION_SCHEMA = pa.schema([("season", pa.string()), ("gw", pa.int16())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+
+
+def _partition_dir(kind, season, gameweek, root=STORE_DIR):
+    return os.path.join(root, kind, f"season={season}", f"gw={int(gameweek)}")
+
+
+def write(kind, df, season, gameweek, root=STORE_DIR):
+    """Stores df as the `kind` ("X" or "y") table for one gameweek, replacing any previous one."""
+    schema = SCHEMAS[kind]
+    table = pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+
+    path = os.path.join(_partition_dir(kind, season, gameweek, root), "part-0.parquet")
+    with atomic_path(path) as tmp_path:
+        pq.write_table(table, tmp_path)
+    return path
+
+
+def partitions(kind, root=STORE_DIR):
+    """Returns the stored (season, gameweek) pairs of a table."""
+    base = os.path.join(root, kind)
+    if not os.path.isdir(base):
+        return []
+
+    found = []
+    for season_dir in os.listdir(base):
+        m = re.match(r"^season=(.+)$", season_dir)
+        if not m:
+            continue
+        for gw_dir in os.listdir(os.path.join(base, season_dir)):
+            g = re.match(r"^gw=(\d+)$", gw_dir)
+            if g and os.path.exists(os.path.join(base, season_dir, gw_dir, "part-0.parquet")):
+                found.append((m.group(1), int(g.group(1))))
+    return sorted(found)
+
+
+def stored_gameweeks(kind="X", season=None, root=STORE_DIR):
+    """
+    Returns {gameweek: season} for a table. Without a season, each gameweek number maps
+    to the latest season that holds it.
+    """
+    result = {}
+    for s, gw in partitions(kind, root):
+        if season is None or s == season:
+            result[gw] = s
+    return dict(sorted(result.items()))
+
+
+def checksum(kind, season, gameweek, root=STORE_DIR):
+    """Returns the SHA-256 of a stored partition's file, for keying results derived from it."""
+    path = os.path.join(_partition_dir(kind, season, gameweek, root), "part-0.parquet")
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def paired_gameweeks(season=None, root=STORE_DIR):
+    """Returns {gameweek: season} for gameweeks whose X and y come from the same season."""
+    y_gws = stored_gameweeks("y", season, root)
+    return {
+        gw: s for gw, s in stored_gameweeks("X", season, root).items()
+        if y_gws.get(gw) == s
+    }
+
+
+def load(kind="X", gameweeks=None, columns=None, season=None, root=STORE_DIR):
+    """
+    Reads a table for the given gameweeks (all when None) in one scan. Returns the requested
+    columns (all when None) plus the `season` and `gw` partition columns.
+    """
+    stored = stored_gameweeks(kind, season, root)
+    if gameweeks is None:
+        wanted = stored
+    else:
+        if isinstance(gameweeks, int):
+            gameweeks = [gameweeks]
+        wanted = {gw: stored[gw] for gw in gameweeks if gw in stored}
+
+    schema = SCHEMAS[kind]
+    columns = list(schema.names if columns is None else columns)
+    if not wanted:
+        empty = pa.schema([schema.field(c) for c in columns]).empty_table().to_pandas()
+        return empty.assign(season=pd.Series(dtype=str), gw=pd.Series(dtype="int16"))
+
+    files = [
+        os.path.join(_partition_dir(kind, s, gw, root), "part-0.parquet")
+        for gw, s in wanted.items()
+    ]
+    dataset = ds.dataset(
+        files, schema=pa.unify_schemas([schema, PARTITION_SCHEMA]), format="parquet",
+        partitioning=PARTITIONING, partition_base_dir=os.path.join(root, kind),
+    )
+    return dataset.to_table(columns=columns + ["season", "gw"]).to_pandas()
+
+
+def load_training(gameweeks=None, x_columns=None, season=None, root=STORE_DIR):
+    """
+    Returns X joined with y (gw_points, gw_minutes) for the paired gameweeks among
+    `gameweeks`, one row per player per gameweek.
+    """
+    paired = paired_gameweeks(season, root)
+    gws = [gw for gw in (paired if gameweeks is None else gameweeks) if gw in paired]
+    X = load("X", gws, x_columns, season, root)
+    y = load("y", gws, ["player_id", "gw_points", "gw_minutes"], season, root)
+    return X.merge(y, on=["season", "gw", "player_id"], how="inner")
+
+
+def import_csvs(season, gws=None, data_dir=DATA_DIR, root=STORE_DIR):
+    """Copies data_dir/X_<gw>.csv and y_<gw>.csv into the store under `season`."""
+    pattern = re.compile(r"^(X|y)_(\d+)\.csv$")
+    for f in sorted(os.listdir(data_dir), key=lambda f: (len(f), f)):
+        m = pattern.match(f)
+        if not m or (gws is not None and int(m.group(2)) not in gws):
+            continue
+        kind, gw = m.group(1), int(m.group(2))
+        df = pd.read_csv(os.path.join(data_dir, f))
+        write(kind, df, season, gw, root)
+        print(f"  {f} -> {kind} season={season} gw={gw} ({len(df)} rows)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "import":
+        gws = None
+        if len(sys.argv) > 3:
+            first, _, last = sys.argv[3].partition("-")
+            gws = range(int(first), int(last or first) + 1)
+        import_csvs(sys.argv[2], gws)
+    elif len(sys.argv) == 2 and sys.argv[1] == "list":
+        for kind in SCHEMAS:
+            for season, gw in partitions(kind):
+                print(f"{kind} season={season} gw={gw}")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,133 @@
+"""Small client for the official FPL API.
+
+Every endpoint is downloaded and parsed at most once per run; the DataFrames
+derived from it are built once and handed out as copies so callers can add
+columns freely.  data_v3.py, preseason.py and backfill.py all share the
+module-level `fpl` instance.  Requests go through the on-disk response cache
+in http_cache.py, so re-runs within an endpoint's TTL hit the network only to
+revalidate.  The memos are guarded by per-key locks, so stages running in
+parallel threads (see stages.py) share one download of each endpoint.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from http_cache import cache
+from replay import SERVER_URL
+
+FPL_API_URL = f"{SERVER_URL}/api" if SERVER_URL else "https://fantasy.premierleague.com/api"
+
+# Max element-summary requests in flight at once
+ELEMENT_SUMMARY_WORKERS = 16
+
+
+class FPLClient:
+    def __init__(self, base_url=FPL_API_URL, max_workers=ELEMENT_SUMMARY_WORKERS, http=cache):
+        self.base_url = base_url.rstrip("/")
+        self.max_workers = max_workers
+        self.http = http
+        self._json = {}
+        self._frames = {}
+        self._summaries = {}
+        self._lock = threading.Lock()
+        self._locks = {}
+
+    def _lock_for(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, path):
+        """Returns the parsed JSON for an API path, downloading it only the first time."""
+        with self._lock_for(("json", path)):
+            if path not in self._json:
+                self._json[path] = self.http.get_json(f"{self.base_url}/{path}")
+        return self._json[path]
+
+    def clear(self):
+        """Forgets everything fetched so far (e.g. between gameweeks in a long-lived process)."""
+        self._json.clear()
+        self._frames.clear()
+        self._summaries.clear()
+
+    def bootstrap(self):
+        return self.get("bootstrap-static/")
+
+    def fixtures_data(self):
+        return self.get("fixtures/")
+
+    def _frame(self, key, build):
+        with self._lock_for(("frame", key)):
+            if key not in self._frames:
+                self._frames[key] = build()
+        return self._frames[key].copy()
+
+    def players(self):
+        """bootstrap-static `elements` as a DataFrame."""
+        return self._frame("players", lambda: pd.DataFrame(self.bootstrap()["elements"]))
+
+    def teams(self):
+        """bootstrap-static `teams` as a DataFrame."""
+        return self._frame("teams", lambda: pd.DataFrame(self.bootstrap()["teams"]))
+
+    def events(self):
+        """bootstrap-static `events` as a DataFrame."""
+        return self._frame("events", lambda: pd.DataFrame(self.bootstrap()["events"]))
+
+    def fixtures(self):
+        """The full season fixture list as a DataFrame."""
+        return self._frame("fixtures", lambda: pd.DataFrame(self.fixtures_data()))
+
+    def team_names(self):
+        """Maps FPL team id -> team name."""
+        return {team["id"]: team["name"] for team in self.bootstrap()["teams"]}
+
+    def position_names(self):
+        """Maps FPL element_type id -> singular position name."""
+        return {pos["id"]: pos["singular_name"] for pos in self.bootstrap()["element_types"]}
+
+    def event_live(self, gameweek):
+        """
+        Points and minutes for every player in one gameweek from /event/{gw}/live/.
+        Returns a DataFrame with id, gw_points and gw_minutes columns.
+        """
+        elements = self.get(f"event/{gameweek}/live/")["elements"]
+        return pd.DataFrame({
+            "id": [e["id"] for e in elements],
+            "gw_points": [e["stats"]["total_points"] for e in elements],
+            "gw_minutes": [e["stats"]["minutes"] for e in elements],
+        })
+
+    def _fetch_element_summaries(self, player_ids):
+        def fetch(pid):
+            return self.http.get_json(f"{self.base_url}/element-summary/{pid}/")
+
+        summaries = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(fetch, pid): pid for pid in player_ids}
+            for future in as_completed(futures):
+                pid = futures[future]
+                try:
+                    summaries[pid] = future.result()
+                except Exception as e:
+                    print(f"Error processing player {pid}: {e}")
+
+        return summaries
+
+    def element_summaries(self, player_ids):
+        """
+        Returns element-summary payloads keyed by player id, fetching each player at most
+        once per run with a bounded thread pool. Players whose request fails are logged and
+        left out.
+        """
+        with self._lock_for("element-summaries"):
+            missing = [pid for pid in player_ids if pid not in self._summaries]
+            if missing:
+                self._summaries.update(self._fetch_element_summaries(missing))
+
+        return {pid: self._summaries[pid] for pid in player_ids if pid in self._summaries}
+
+
+fpl = FPLClient()
@@ -0,0 +1,150 @@
+"""On-disk response cache for the FPL and Understat fetchers.
+
+Each response is stored as one JSON file under CACHE_DIR, keyed by a hash of
+its URL.  Entries younger than their endpoint's TTL are served straight from
+disk; older ones are revalidated with If-None-Match / If-Modified-Since so an
+unchanged payload costs a 304 instead of a full download.  Understat is
+scraped through understatapi rather than plain HTTP, so its payloads are
+cached by name with a TTL only (see `ResponseCache.cached`).  Every fetch that
+does hit the network goes through the shared rate limiter in rate_limit.py.
+Record/replay and the local stand-in server (replay.py) hook in here too, as
+does the per-gameweek payload archive (snapshots.py).
+"""
+
+import hashlib
+import json
+import os
+import time
+from urllib.parse import quote, urlparse
+
+import requests
+
+from atomic import atomic_open
+from rate_limit import REQUEST_TIMEOUT, check_status, limiter
+from replay import SERVER_URL, key_for_url, player, recorder
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "http")
+
+# (substring of the URL or key, seconds an entry is fresh). First match wins.
+ENDPOINT_TTLS = [
+    ("/event/", 10 * 60),
+    ("/bootstrap-static/", 60 * 60),
+    ("/fixtures/", 60 * 60),
+    ("/element-summary/", 6 * 60 * 60),
+    ("understat/", 6 * 60 * 60),
+]
+DEFAULT_TTL = 60 * 60
+
+
+class ResponseCache:
+    def __init__(self, cache_dir=CACHE_DIR, ttls=ENDPOINT_TTLS, default_ttl=DEFAULT_TTL,
+                 recorder=recorder, player=player):
+        self.cache_dir = cache_dir
+        self.ttls = ttls
+        self.default_ttl = default_ttl
+        self.session = requests.Session()
+        # Anything with Recording's has/load/save: payloads are served from `player` when
+        # set, and every payload used is saved to `recorder` and `archive`.
+        self.recorder = recorder
+        self.player = player
+        self.archive = None
+
+    def ttl_for(self, key):
+        for fragment, ttl in self.ttls:
+            if fragment in key:
+                return ttl
+        return self.default_ttl
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.json")
+
+    def _load(self, key):
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key, entry):
+        if self.cache_dir is None:
+            return
+        # Write-then-rename so a crash or a concurrent reader never sees half a file
+        with atomic_open(self._path(key)) as f:
+            json.dump(entry, f)
+
+    def _keep(self, key, body):
+        for sink in (self.recorder, self.archive):
+            # A snapshot being rebuilt from already holds every payload it serves
+            if sink is not None and sink is not self.player:
+                sink.save(key, body)
+
+    def _is_fresh(self, key, entry):
+        return time.time() - entry["fetched_at"] < self.ttl_for(key)
+
+    def get_json(self, url):
+        """Returns the parsed JSON body of a GET request, from disk when possible."""
+        if self.player is not None:
+            body = self.player.load(key_for_url(url))
+        else:
+            body = self._get_json(url)
+        self._keep(key_for_url(url), body)
+        return body
+
+    def _get_json(self, url):
+        entry = self._load(url)
+        if entry is not None and self._is_fresh(url, entry):
+            return entry["body"]
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = limiter.call(
+            urlparse(url).hostname,
+            lambda: check_status(self.session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)),
+        )
+
+        if response.status_code == 304 and entry is not None:
+            entry["fetched_at"] = time.time()
+            self._store(url, entry)
+            return entry["body"]
+
+        response.raise_for_status()
+        body = response.json()
+        self._store(url, {
+            "url": url,
+            "fetched_at": time.time(),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "body": body,
+        })
+        return body
+
+    def cached(self, key, fetch, host=None):
+        """
+        Returns fetch() for a non-HTTP source such as Understat, reusing a fresh copy on disk.
+        host selects the rate-limit bucket fetch() is run under.
+        """
+        if self.player is not None:
+            body = self.player.load(key)
+        elif SERVER_URL is not None:
+            return self.get_json(f"{SERVER_URL}/{quote(key)}/")
+        else:
+            entry = self._load(key)
+            if entry is not None and self._is_fresh(key, entry):
+                body = entry["body"]
+            else:
+                body = limiter.call(host, fetch)
+                self._store(key, {"url": key, "fetched_at": time.time(), "body": body})
+
+        self._keep(key, body)
+        return body
+
+
+cache = ResponseCache()
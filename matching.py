@@ -0,0 +1,150 @@
+"""Matches FPL players to Understat players by name.
+
+Replaces the per-name `process.extractOne` scan over every Understat name.
+Candidates are blocked by team (and goalkeeper vs outfield) and each block
+is scored in one batch with rapidfuzz's `cdist`, normalizing names the way
+`thefuzz` does so scores are identical.  Players with no good match inside their block, such
+as players who changed clubs, fall back to one batch against every name.
+
+Confirmed matches are kept in the player registry as each player's
+understat_id, and players with no match as a key of the Understat candidates
+they were scored against, so later runs only score players that are new or
+that could match a newly appeared Understat player.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process, utils
+
+from registry import get_registry
+
+MATCH_THRESHOLD = 92
+
+# thefuzz's WRatio drops Latin-1 characters (code points 128-255) before scoring
+_LATIN1 = {i: None for i in range(128, 256)}
+
+
+def _process(name):
+    """Normalizes a name exactly as thefuzz.process.extractOne does for WRatio."""
+    return utils.default_process(utils.default_process(name).translate(_LATIN1))
+
+
+def _best_matches(queries, choices, threshold):
+    """Scores every query against every choice in one batch; returns (choice index or -1, score) per query."""
+    if not queries or not choices:
+        return np.full(len(queries), -1), np.zeros(len(queries))
+
+    scores = process.cdist(
+        queries, choices, scorer=fuzz.WRatio, processor=_process, workers=-1
+    )
+    # thefuzz reports integer scores, so round before applying the threshold
+    scores = np.round(scores)
+    best = scores.argmax(axis=1)
+    best_scores = scores[np.arange(len(queries)), best]
+    return np.where(best_scores >= threshold, best, -1), best_scores
+
+
+def _is_goalkeeper(position):
+    if pd.isna(position):
+        return None
+    return position == "Goalkeeper" or "GK" in str(position).split()
+
+
+def candidates_key(u_ids, u_names, threshold):
+    """Hash of an Understat candidate set and threshold; a failed match holds until it changes."""
+    candidates = sorted(f"{uid}:{name}" for uid, name in zip(u_ids, u_names))
+    return hashlib.sha256(json.dumps([threshold, candidates]).encode("utf-8")).hexdigest()
+
+
+def match_players(fpl_df, understat_df, threshold=MATCH_THRESHOLD, team_aliases=None,
+                  position_col="position", registry=None):
+    """
+    Returns a Series aligned with fpl_df holding the matched Understat `player_name`, or None.
+
+    fpl_df needs full_name and may carry team_name and position_col for blocking, and
+    player_id for looking up and recording matches in the registry (the shared one when
+    registry is None).
+    understat_df needs player_name and may carry understat_id, understat_team (Understat's
+    comma-separated team_title) and understat_position. team_aliases normalizes team names
+    on both sides (e.g. TEAM_TEST_MAP).
+    """
+    team_aliases = team_aliases or {}
+
+    def norm_team(name):
+        return team_aliases.get(name, name)
+
+    u = understat_df.reset_index(drop=True)
+    u_names = u["player_name"].tolist()
+    u_ids = u["understat_id"].astype(str).tolist() if "understat_id" in u else [None] * len(u)
+    name_by_uid = {uid: name for uid, name in zip(u_ids, u_names) if uid is not None}
+
+    fpl = fpl_df.reset_index(drop=True)
+    names = fpl["full_name"].tolist()
+    player_ids = fpl["player_id"].tolist() if "player_id" in fpl else [None] * len(fpl)
+    result = [None] * len(fpl)
+
+    # 1. Reuse earlier runs' results: confirmed matches, and players that found no match
+    #    among exactly these candidates
+    registry = registry or get_registry()
+    key = candidates_key(u_ids, u_names, threshold)
+    to_score = []
+    for i, (pid, name) in enumerate(zip(player_ids, names)):
+        if pd.isna(name):
+            continue
+        uid = registry.understat_id(pid)
+        if uid in name_by_uid:
+            result[i] = name_by_uid[uid]
+        elif registry.unmatched_key(pid) != key:
+            to_score.append(i)
+
+    # 2. Score the rest block by block (team, goalkeeper or not)
+    u_teams = [
+        {norm_team(t.strip()) for t in str(title).split(",")} if not pd.isna(title) else set()
+        for title in (u["understat_team"] if "understat_team" in u else [None] * len(u))
+    ]
+    u_gk = [_is_goalkeeper(p) for p in (u["understat_position"] if "understat_position" in u else [None] * len(u))]
+    fpl_teams = [norm_team(t) for t in fpl["team_name"]] if "team_name" in fpl else [None] * len(fpl)
+    fpl_gk = [_is_goalkeeper(p) for p in fpl[position_col]] if position_col in fpl else [None] * len(fpl)
+
+    blocks = {}
+    for i in to_score:
+        blocks.setdefault((fpl_teams[i], fpl_gk[i]), []).append(i)
+
+    unmatched = []
+    for (team, gk), rows in blocks.items():
+        if team is None:
+            unmatched.extend(rows)
+            continue
+        cand = [
+            j for j in range(len(u))
+            if team in u_teams[j] and (gk is None or u_gk[j] is None or u_gk[j] == gk)
+        ]
+        best, _ = _best_matches([names[i] for i in rows], [u_names[j] for j in cand], threshold)
+        for i, b in zip(rows, best):
+            if b >= 0:
+                result[i] = u_names[cand[b]]
+            else:
+                unmatched.append(i)
+
+    # 3. Anyone not found in their block is scored against every Understat name
+    best, _ = _best_matches([names[i] for i in unmatched], u_names, threshold)
+    for i, b in zip(unmatched, best):
+        if b >= 0:
+            result[i] = u_names[b]
+
+    # 4. Record the new matches and misses in the registry
+    uid_by_name = dict(zip(u_names, u_ids))
+    scored = [i for i in to_score if player_ids[i] is not None]
+    new_matches = [(player_ids[i], uid_by_name.get(result[i])) for i in scored if result[i] is not None]
+    misses = [player_ids[i] for i in scored if result[i] is None]
+    if new_matches:
+        registry.set_understat_ids(*zip(*new_matches))
+    if misses:
+        registry.set_unmatched(misses, key)
+    if scored:
+        registry.save()
+
+    return pd.Series(result, index=fpl_df.index, dtype=object)
@@ -0,0 +1,52 @@
+"""Persistent ledger of per-gameweek backtest metrics.
+
+Scoring a past gameweek means refitting the model on everything before it, and
+the result only changes if the model config or the stored X/y it depends on
+change.  The ledger keeps each gameweek's metrics under a key hashing exactly
+those inputs (see model.fold_key), in data/metrics_ledger.json:
+
+  {"gameweeks": {"29": {"<key>": {"metrics": {...}, "computed_at": "..."}}}}
+
+so publish only refits the gameweeks that are new or whose key changed.
+Entries under older keys are kept, so switching a config back reuses them.
+"""
+
+import json
+import os
+from datetime import datetime
+
+from atomic import atomic_open
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+LEDGER_PATH = os.path.join(DATA_DIR, "metrics_ledger.json")
+
+
+class MetricsLedger:
+    def __init__(self, gameweeks=None, path=LEDGER_PATH):
+        self.gameweeks = gameweeks or {}
+        self.path = path
+
+    @classmethod
+    def load(cls, path=LEDGER_PATH):
+        if not os.path.exists(path):
+            return cls(path=path)
+        with open(path) as f:
+            return cls(json.load(f)["gameweeks"], path)
+
+    def get(self, gameweek, key):
+        """Returns the metrics stored for `gameweek` under `key`, or None."""
+        entry = self.gameweeks.get(str(gameweek), {}).get(key)
+        return entry["metrics"] if entry else None
+
+    def put(self, gameweek, key, metrics):
+        self.gameweeks.setdefault(str(gameweek), {})[key] = {
+            "metrics": metrics,
+            "computed_at": datetime.now().isoformat(),
+        }
+
+    def save(self):
+        with atomic_open(self.path) as f:
+            json.dump(
+                {"gameweeks": dict(sorted(self.gameweeks.items(), key=lambda kv: int(kv[0])))},
+                f, indent=1,
+            )
@@ -1,7 +1,9 @@
+import hashlib
 import json
 import os
-import re
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 
 import numpy as np
@@ -12,65 +14,90 @@ from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder
 from scipy.stats import spearmanr
+import sklearn
+from threadpoolctl import threadpool_limits
+
+import feature_store
+import model_cache
+from metrics_ledger import MetricsLedger
+from panel import get_panel, set_panel
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 PUBLISH_DIR = "/var/www/reedrogers/data"
 UNDERSTAT_SEASON = "2026"
+# Max backtest folds fitted at once
+BACKTEST_WORKERS = os.cpu_count() or 4
+
+HYPERPARAMS = {
+    "learning_rate": 0.01,
+    "max_depth": 4,
+    "max_iter": 200,
+    "min_samples_leaf": 20,
+    "random_state": 42,
+}
+CATEGORICAL = ["team_name", "player_position"]
+# Players need this many minutes over the last 3 GWs to be trained on / predicted
+MIN_MINUTES_LAST_3 = 180
+
+
+def training_gameweeks(gameweek, paired):
+    """Prefer prior gameweeks only; fall back to all available if none exist."""
+    prior_gws = [gw for gw in paired if gw < gameweek]
+    return prior_gws if prior_gws else sorted(paired)
+
+
+def model_key(train_gws, checksums):
+    """
+    Hash of everything a fitted model depends on: hyperparameters, feature schema, sklearn
+    version and the content of its training partitions (`checksums` as returned by
+    Panel.checksums). Keys both the model cache and the metrics ledger.
+    """
+    config = {
+        "hyperparams": HYPERPARAMS,
+        "categorical": CATEGORICAL,
+        "min_minutes_last_3": MIN_MINUTES_LAST_3,
+        "schema": [f"{field.name}:{field.type}" for field in feature_store.X_SCHEMA],
+        "sklearn": sklearn.__version__,
+        "train": [[gw, checksums[("X", gw)], checksums[("y", gw)]] for gw in train_gws],
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
 
 
-def predict(gameweek: int, verbose: bool = True):
-    files = os.listdir(DATA_DIR)
-    pattern = re.compile(r"^(X|y)_(\d+)\.csv$")
-
-    file_map: dict[int, dict[str, str]] = {}
-    for f in files:
-        match = pattern.match(f)
-        if match:
-            kind, num = match.groups()
-            file_map.setdefault(int(num), {})[kind] = f
-
-    # Collect paired X/y data
-    all_pairs = {
-        gw: pair
-        for gw, pair in file_map.items()
-        if "X" in pair and "y" in pair
-    }
+def fold_key(gameweek, panel):
+    """Ledger key of a backtest fold: its model's key plus the scored gameweek's X and y."""
+    checksums = panel.checksums()
+    key = model_key(training_gameweeks(gameweek, panel.paired_gameweeks()), checksums)
+    key += f":{checksums[('X', gameweek)]}:{checksums[('y', gameweek)]}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
 
-    # Prefer prior gameweeks only; fall back to all available if none exist
-    prior_gws = [gw for gw in all_pairs if gw < gameweek]
-    train_gws = prior_gws if prior_gws else sorted(all_pairs.keys())
-    if not train_gws:
-        raise ValueError("No training data found.")
 
-    merged_dfs = []
-    for gw in train_gws:
-        pair = all_pairs[gw]
-        X = pd.read_csv(os.path.join(DATA_DIR, pair["X"]))
-        y = pd.read_csv(os.path.join(DATA_DIR, pair["y"]))
-        merged = X.merge(y, on="full_name", how="inner")
-        merged = merged[merged["minutes_last_3"] >= 180]
-        merged["gameweek"] = gw
-        merged_dfs.append(merged)
-
-    if not merged_dfs:
-        raise ValueError("No training data found.")
+def fit_model(train_gws, verbose=True):
+    """Returns the pipeline trained on `train_gws`, reusing a cached fit when there is one."""
+    panel = get_panel()
+    key = model_key(train_gws, panel.checksums())
+    model = model_cache.get(key)
+    if model is not None:
+        if verbose:
+            print(f"Reusing cached model trained on {len(train_gws)} gameweeks")
+        return model
 
-    train_df = pd.concat(merged_dfs, ignore_index=True)
+    train_df = panel.training(train_gws)
+    train_df = train_df[train_df["minutes_last_3"] >= MIN_MINUTES_LAST_3]
 
     if verbose:
         print(
-            f"Training on {len(train_df)} instances across {len(merged_dfs)} gameweeks"
+            f"Training on {len(train_df)} instances across {len(train_gws)} gameweeks"
         )
 
-    X_train = train_df.drop(columns=["gw_points", "gw_minutes", "full_name", "gameweek"])
+    X_train = train_df.drop(
+        columns=["gw_points", "gw_minutes", "player_id", "full_name", "gameweek", "season", "gw"]
+    )
     y_train = train_df["gw_points"]
 
-    categorical = ["team_name", "player_position"]
-    numeric = X_train.columns.difference(categorical)
+    numeric = X_train.columns.difference(CATEGORICAL)
 
     preprocessor = ColumnTransformer(
         transformers=[
-            ("cat", OneHotEncoder(handle_unknown="ignore"), categorical),
+            ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL),
             ("num", "passthrough", numeric),
         ]
     )
@@ -80,45 +107,65 @@ def predict(gameweek: int, verbose: bool = True):
             ("prep", preprocessor),
             (
                 "model",
-                HistGradientBoostingRegressor(
-                    learning_rate=0.01,
-                    max_depth=4,
-                    max_iter=200,
-                    min_samples_leaf=20,
-                    random_state=42,
-                ),
+                HistGradientBoostingRegressor(**HYPERPARAMS),
             ),
         ]
     )
 
     model.fit(X_train, y_train)
+    model_cache.put(key, model)
+    return model
+
+
+def predict_horizon(gameweek, num_weeks=1, verbose=True):
+    """
+    Predicts GWs gameweek..gameweek+num_weeks-1 with one model trained on the history
+    available at `gameweek`, scoring every week's features in a single call. Returns a long
+    table with one row per player per gameweek; weeks without stored features are absent.
+    """
+    panel = get_panel()
+    train_gws = training_gameweeks(gameweek, panel.paired_gameweeks())
+    if not train_gws:
+        raise ValueError("No training data found.")
 
-    if gameweek not in file_map or "X" not in file_map[gameweek]:
-        raise ValueError(f"X_{gameweek}.csv not found")
+    model = fit_model(train_gws, verbose)
 
-    X_latest = pd.read_csv(os.path.join(DATA_DIR, file_map[gameweek]["X"]))
-    X_latest_filtered = X_latest[X_latest["minutes_last_3"] >= 180]
-    if len(X_latest_filtered) == 0:
-        X_latest_filtered = X_latest
+    last = gameweek + num_weeks - 1
+    X = panel.features(list(range(gameweek, last + 1)))
+    if len(X) == 0:
+        raise ValueError(f"No features stored for GW {gameweek}" + (f"-{last}" if last > gameweek else ""))
+
+    # Gameweeks where nobody passes the minutes filter (pre-season) keep every player
+    active = X["minutes_last_3"] >= MIN_MINUTES_LAST_3
+    active |= ~active.groupby(X["gw"]).transform("any")
+    X = X[active]
 
     preds = model.predict(
-        X_latest_filtered.drop(columns=["full_name", "gw_minutes"], errors="ignore")
+        X.drop(columns=["player_id", "full_name", "gw_minutes", "season", "gw"], errors="ignore")
     )
 
-    pred_df = pd.DataFrame(
+    return pd.DataFrame(
         {
-            "full_name": X_latest_filtered["full_name"],
-            "team_name": X_latest_filtered["team_name"],
-            "position": X_latest_filtered["player_position"],
+            "gameweek": X["gw"].astype(int),
+            "player_id": X["player_id"],
+            "full_name": X["full_name"],
+            "team_name": X["team_name"].astype(str),
+            "position": X["player_position"].astype(str),
+            "current_fpl_cost": X["current_fpl_cost"],
             "predicted_points": np.round(preds, 2),
         }
-    )
+    ).reset_index(drop=True)
+
+
+def predict(gameweek: int, verbose: bool = True):
+    pred_df = predict_horizon(gameweek, 1, verbose).drop(columns=["gameweek", "current_fpl_cost"])
 
     metrics = None
-    if "y" in file_map.get(gameweek, {}):
-        y_actual = pd.read_csv(os.path.join(DATA_DIR, file_map[gameweek]["y"]))
+    panel = get_panel()
+    if gameweek in panel.paired_gameweeks():
+        y_actual = panel.targets([gameweek], ["player_id", "gw_points"])
         pred_df = pred_df.merge(
-            y_actual[["full_name", "gw_points"]], on="full_name", how="left"
+            y_actual[["player_id", "gw_points"]], on="player_id", how="left"
         )
         pred_df.rename(columns={"gw_points": "actual_points"}, inplace=True)
         metrics = _evaluate(pred_df, gameweek, verbose=verbose)
@@ -139,8 +186,8 @@ def _evaluate(pred_df, gameweek, verbose=True):
     r2 = r2_score(scored["actual_points"], scored["predicted_points"])
     rho, p_value = spearmanr(scored["actual_points"], scored["predicted_points"])
 
-    top_predicted = set(scored.nlargest(20, "predicted_points")["full_name"])
-    top_actual = set(scored.nlargest(20, "actual_points")["full_name"])
+    top_predicted = set(scored.nlargest(20, "predicted_points")["player_id"])
+    top_actual = set(scored.nlargest(20, "actual_points")["player_id"])
     overlap = len(top_predicted & top_actual)
 
     if verbose:
@@ -186,20 +233,58 @@ def _evaluate(pred_df, gameweek, verbose=True):
     }
 
 
+def _init_worker(panel):
+    set_panel(panel)
+    # One fold per core; stop each fit from also spreading over every core
+    threadpool_limits(1)
+
+
+def _backtest_fold(gameweek):
+    """Process-pool task: fits on the gameweeks before `gameweek` and scores it."""
+    start = time.perf_counter()
+    try:
+        _, metrics = predict(gameweek, verbose=False)
+    except ValueError as e:
+        return None, str(e), time.perf_counter() - start
+    return metrics, None, time.perf_counter() - start
+
+
+def walk_forward(test_gws, workers=BACKTEST_WORKERS, verbose=False):
+    """
+    Backtests each gameweek in `test_gws` with a model trained on the gameweeks before it,
+    one fold per process. Workers get the panel once, at start-up. Returns one row of
+    metrics per scored gameweek, in gameweek order.
+    """
+    panel = get_panel()
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(panel,)) as pool:
+        futures = {pool.submit(_backtest_fold, gw): gw for gw in test_gws}
+        for i, future in enumerate(as_completed(futures), 1):
+            gw = futures[future]
+            metrics, error, seconds = future.result()
+            if metrics:
+                rows.append(metrics)
+            if verbose and error:
+                print(f"  [{i}/{len(test_gws)}] Skipping GW {gw}: {error}")
+            elif verbose and metrics:
+                print(
+                    f"  [{i}/{len(test_gws)}] GW {gw}: MAE {metrics['mae']:.2f}, "
+                    f"Spearman {metrics['spearman']:.3f} ({seconds:.1f}s)"
+                )
+
+    columns = ["gameweek", "n_players", "mae", "rmse", "r2", "spearman", "top20_precision"]
+    return pd.DataFrame(rows, columns=columns).sort_values("gameweek", ignore_index=True)
+
+
 def find_latest_gameweek():
-    pattern = re.compile(r"^X_(\d+)\.csv$")
-    gws = []
-    for f in os.listdir(DATA_DIR):
-        m = pattern.match(f)
-        if m:
-            gws.append(int(m.group(1)))
+    panel = get_panel()
+    gws = panel.gameweeks()
     if not gws:
-        raise ValueError("No X_*.csv files found in data/")
+        raise ValueError("No features found in the feature store")
 
     latest = max(gws)
     # During pre-season, prefer GW 1 over stale old-season gameweeks
-    y_path = os.path.join(DATA_DIR, f"y_{latest}.csv")
-    if not os.path.exists(y_path) and 1 in gws:
+    if latest not in panel.paired_gameweeks() and 1 in gws:
         return 1
     return latest
 
@@ -208,30 +293,22 @@ def compute_metrics_json(gameweek=None):
     if gameweek is None:
         gameweek = find_latest_gameweek()
 
-    files = os.listdir(DATA_DIR)
-    pattern = re.compile(r"^(X|y)_(\d+)\.csv$")
-
-    file_map: dict[int, dict[str, str]] = {}
-    for f in files:
-        match = pattern.match(f)
-        if match:
-            kind, num = match.groups()
-            file_map.setdefault(int(num), {})[kind] = f
-
-    test_gws = sorted(
-        n
-        for n in file_map
-        if "X" in file_map[n] and "y" in file_map[n]
-    )
-
-    backtest = []
-    for gw_test in test_gws:
-        try:
-            _, metrics = predict(gw_test, verbose=False)
-            if metrics:
-                backtest.append(metrics)
-        except ValueError:
-            continue
+    panel = get_panel()
+    test_gws = sorted(panel.paired_gameweeks())
+
+    # Only refit the gameweeks that are new or whose model / data changed
+    ledger = MetricsLedger.load()
+    keys = {gw: fold_key(gw, panel) for gw in test_gws}
+    stale = [gw for gw in test_gws if ledger.get(gw, keys[gw]) is None]
+    if stale:
+        print(f"  Backtesting {len(stale)} new or changed gameweeks: {stale}")
+        for metrics in walk_forward(stale).to_dict("records"):
+            ledger.put(metrics["gameweek"], keys[metrics["gameweek"]], metrics)
+        ledger.save()
+
+    backtest = [
+        ledger.get(gw, keys[gw]) for gw in test_gws if ledger.get(gw, keys[gw]) is not None
+    ]
 
     latest_eval = backtest[-1] if backtest else {}
 
@@ -252,35 +329,28 @@ def publish(gameweek=None):
 
     pred_df, _ = predict(gameweek, verbose=True)
 
-    files = os.listdir(DATA_DIR)
-    pattern = re.compile(r"^(X|y)_(\d+)\.csv$")
-    file_map: dict[int, dict[str, str]] = {}
-    for f in files:
-        match = pattern.match(f)
-        if match:
-            kind, num = match.groups()
-            file_map.setdefault(int(num), {})[kind] = f
-
-    csv_df = pred_df[["full_name", "team_name", "position", "predicted_points"]].copy()
+    csv_df = pred_df[
+        ["player_id", "full_name", "team_name", "position", "predicted_points"]
+    ].copy()
     csv_df["actual_points"] = pred_df.get("actual_points", "")
     csv_df["gameweek"] = gameweek
 
     # Merge cost from X data
-    X_path = os.path.join(DATA_DIR, f"X_{gameweek}.csv")
-    if os.path.exists(X_path):
-        X = pd.read_csv(X_path)
+    panel = get_panel()
+    X = panel.features([gameweek], ["player_id", "current_fpl_cost"])
+    if len(X) > 0:
         csv_df = csv_df.merge(
-            X[["full_name", "current_fpl_cost"]].drop_duplicates(subset="full_name"),
-            on="full_name", how="left"
+            X[["player_id", "current_fpl_cost"]].drop_duplicates(subset="player_id"),
+            on="player_id", how="left"
         )
         csv_df["cost"] = (csv_df["current_fpl_cost"].fillna(0) / 10).round(1)
     else:
         csv_df["cost"] = ""
 
-    if "y" in file_map.get(gameweek, {}):
-        y_actual = pd.read_csv(os.path.join(DATA_DIR, file_map[gameweek]["y"]))
+    if gameweek in panel.paired_gameweeks():
+        y_actual = panel.targets([gameweek], ["player_id", "gw_minutes"])
         csv_df = csv_df.merge(
-            y_actual[["full_name", "gw_minutes"]], on="full_name", how="left"
+            y_actual[["player_id", "gw_minutes"]], on="player_id", how="left"
         )
         csv_df["gw_minutes"] = csv_df["gw_minutes"].fillna(0).astype(int)
     else:
@@ -296,6 +366,7 @@ def publish(gameweek=None):
             "gameweek",
             "gw_minutes",
             "cost",
+            "player_id",
         ]
     ]
 
@@ -330,9 +401,9 @@ def publish(gameweek=None):
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python model.py <gameweek> [--backtest] [--publish]")
+        print("Usage: python model.py <gameweek> [--backtest [--workers N]] [--publish]")
         print("  python model.py 5                  predict & evaluate GW 5")
-        print("  python model.py 5 --backtest       evaluate all GWs up to 5")
+        print("  python model.py 5 --backtest       evaluate all GWs up to 5 in parallel")
         print("  python model.py 5 --publish        predict GW 5 and publish to web")
         print("  python model.py --publish-latest   auto-detect latest GW and publish")
         sys.exit(1)
@@ -349,24 +420,13 @@ if __name__ == "__main__":
         publish(gw)
     elif backtest:
         gw = int(sys.argv[1])
-        pattern = re.compile(r"^(X)_(\d+)\.csv$")
-        all_gws = set()
-        for f in os.listdir(DATA_DIR):
-            m = pattern.match(f)
-            if m:
-                all_gws.add(int(m.group(2)))
-
-        test_gws = sorted(
-            n
-            for n in all_gws
-            if n <= gw and os.path.exists(os.path.join(DATA_DIR, f"y_{n}.csv"))
-        )
-        print(f"Backtesting {len(test_gws)} gameweeks up to GW {gw}...")
-        for gw_test in test_gws:
-            try:
-                predict(gw_test)
-            except ValueError as e:
-                print(f"  Skipping GW {gw_test}: {e}")
+        test_gws = [n for n in get_panel().paired_gameweeks() if n <= gw]
+        workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else BACKTEST_WORKERS
+        print(f"Backtesting {len(test_gws)} gameweeks up to GW {gw} on {workers} workers...")
+        start = time.perf_counter()
+        results = walk_forward(test_gws, workers, verbose=True)
+        print(f"\nBacktested {len(results)} gameweeks in {time.perf_counter() - start:.1f}s")
+        print(results.to_string(index=False))
     else:
         gw = int(sys.argv[1])
         pred_df, _ = predict(gw)
@@ -0,0 +1,50 @@
+"""Content-addressed cache of fitted model pipelines.
+
+A fitted pipeline depends only on its hyperparameters, feature schema and
+training data, which model.model_key hashes.  Pipelines are pickled under
+that key:
+
+    .cache/models/3f/3fa4...c1.pkl
+
+so predicting the same gameweek again, or another gameweek with the same
+training set (as optimize.py does across its horizon), reuses the model
+instead of refitting it, within a run and across cron runs.  Pipelines used
+in this process are also kept in memory.
+"""
+
+import os
+import pickle
+import threading
+
+from atomic import atomic_open
+
+MODEL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "models")
+
+_fitted = {}
+_fitted_lock = threading.Lock()
+
+
+def path(key, root=MODEL_CACHE_DIR):
+    return os.path.join(root, key[:2], f"{key}.pkl")
+
+
+def get(key, root=MODEL_CACHE_DIR):
+    """Returns the pipeline cached under `key`, or None."""
+    with _fitted_lock:
+        if key in _fitted:
+            return _fitted[key]
+    p = path(key, root)
+    if not os.path.exists(p):
+        return None
+    with open(p, "rb") as f:
+        model = pickle.load(f)
+    with _fitted_lock:
+        _fitted[key] = model
+    return model
+
+
+def put(key, model, root=MODEL_CACHE_DIR):
+    with atomic_open(path(key, root), "wb") as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    with _fitted_lock:
+        _fitted[key] = model
@@ -14,63 +14,55 @@ import numpy as np
 import pandas as pd
 from pulp import LpProblem, LpMaximize, LpVariable, lpSum, PULP_CBC_CMD
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+from panel import get_panel
+
 PUBLISH_DIR = "/var/www/reedrogers/data"
 PREDICTIONS_PATH = os.path.join(PUBLISH_DIR, "predictions.csv")
 
+# Feature columns the optimizer needs alongside the predictions
+X_COLUMNS = ["player_id", "current_fpl_cost", "team_name", "player_position"]
+
 
 def load_players(gameweek=None, num_weeks=1):
     if num_weeks > 1:
-        preds = []
+        # One model, trained on the history available at `gameweek`, scores every week
+        from model import predict_horizon
+        all_preds = predict_horizon(gameweek, num_weeks, verbose=False)
+        weeks = sorted(all_preds["gameweek"].unique())
         for gw in range(gameweek, gameweek + num_weeks):
-            x_path = os.path.join(DATA_DIR, f"X_{gw}.csv")
-            if not os.path.exists(x_path):
-                print(f"  X_{gw}.csv missing, skipping")
-                continue
-            X = pd.read_csv(x_path)
-            # predict each GW via model
-            from model import predict as model_predict
-            pred_df, _ = model_predict(gw, verbose=False)
-            X_sub = X[["full_name", "current_fpl_cost", "team_name", "player_position"]]
-            merged = pred_df.merge(X_sub, on="full_name", how="left")
-            merged["position"] = merged["position"].fillna(merged["player_position"])
-            merged["team_name"] = merged["team_name_x"].fillna(merged["team_name_y"])
-            merged["gameweek"] = gw
-            preds.append(merged)
-            print(f"  GW {gw}: {len(merged)} players predicted")
-
-        all_preds = pd.concat(preds, ignore_index=True)
+            if gw in weeks:
+                print(f"  GW {gw}: {(all_preds['gameweek'] == gw).sum()} players predicted")
+            else:
+                print(f"  GW {gw} features missing, skipping")
+
         # Average predicted_points per player across gameweeks
         avg = all_preds.groupby(
-            ["full_name", "team_name", "position", "current_fpl_cost"]
+            ["player_id", "full_name", "team_name", "position", "current_fpl_cost"]
         )["predicted_points"].mean().reset_index()
         avg = avg.rename(columns={"predicted_points": "avg_predicted_points"})
 
         # Also keep the first GW's predicted_points for reference
-        gw1_preds = preds[0][["full_name", "predicted_points"]].rename(
+        first = all_preds[all_preds["gameweek"] == weeks[0]]
+        gw1_preds = first[["player_id", "predicted_points"]].rename(
             columns={"predicted_points": "predicted_points_gw1"}
         )
-        avg = avg.merge(gw1_preds, on="full_name", how="left")
+        avg = avg.merge(gw1_preds, on="player_id", how="left")
 
         avg = avg.dropna(subset=["current_fpl_cost", "position", "team_name"])
         avg = avg.reset_index(drop=True)
 
         actual_gw = gameweek
-        print(f"  Averaged across {len(preds)} GWs: {len(avg)} players")
+        print(f"  Averaged across {len(weeks)} GWs: {len(avg)} players")
         return avg, actual_gw, True
     else:
         pred_df = pd.read_csv(PREDICTIONS_PATH)
         gw = int(pred_df["gameweek"].iloc[0]) if gameweek is None else gameweek
 
-        x_path = os.path.join(DATA_DIR, f"X_{gw}.csv")
-        if not os.path.exists(x_path):
-            raise FileNotFoundError(f"{x_path} not found.")
+        X = get_panel().features([gw], X_COLUMNS)
+        if len(X) == 0:
+            raise FileNotFoundError(f"No features stored for GW {gw}.")
 
-        X = pd.read_csv(x_path)
-        df = pred_df.merge(
-            X[["full_name", "current_fpl_cost", "team_name", "player_position"]],
-            on="full_name", how="left",
-        )
+        df = pred_df.merge(X[X_COLUMNS], on="player_id", how="left")
         df["position"] = df["position"].fillna(df["player_position"])
         df["team_name"] = df["team_name_x"].fillna(df["team_name_y"])
         df = df.dropna(subset=["current_fpl_cost", "position", "team_name"])
@@ -0,0 +1,94 @@
+"""In-memory panel of every stored gameweek's features (X) and targets (y).
+
+The model retrains on all prior gameweeks for every gameweek it predicts, so a
+backtest or a multi-week optimization would otherwise re-read the same
+Parquet partitions over and over.  The panel reads the feature store once per
+process (see get_panel) and hands out slices by gameweek:
+
+  panel.training([29, 30, 31])   # X joined with y, for model fitting
+  panel.features([32])           # X rows to predict
+  panel.targets([32])            # y rows to score against
+
+Gameweek numbers resolve to seasons the same way feature_store.load does.
+"""
+
+import threading
+
+import feature_store
+
+
+class Panel:
+    def __init__(self, X, y, paired):
+        self.X = X
+        self.y = y
+        self.paired = paired
+        self._checksums = None
+        self.train = X[X["gw"].isin(list(paired))].merge(
+            y[["season", "gw", "player_id", "gw_points", "gw_minutes"]],
+            on=["season", "gw", "player_id"], how="inner",
+        )
+
+    @classmethod
+    def load(cls, season=None):
+        paired = feature_store.paired_gameweeks(season)
+        X = feature_store.load("X", season=season)
+        y = feature_store.load("y", season=season)
+        return cls(X, y, paired)
+
+    def gameweeks(self):
+        """Returns the sorted gameweeks that have features."""
+        return sorted(self.X["gw"].unique().tolist())
+
+    def paired_gameweeks(self):
+        """Returns {gameweek: season} for gameweeks with both features and targets."""
+        return self.paired
+
+    def checksums(self):
+        """Returns {(kind, gameweek): content hash} of the paired X and y partitions."""
+        if self._checksums is None:
+            self._checksums = {
+                (kind, gw): feature_store.checksum(kind, season, gw)
+                for gw, season in self.paired.items() for kind in ("X", "y")
+            }
+        return self._checksums
+
+    @staticmethod
+    def _slice(df, gameweeks, columns=None):
+        if isinstance(gameweeks, int):
+            gameweeks = [gameweeks]
+        rows = df[df["gw"].isin(gameweeks)]
+        if columns is not None:
+            rows = rows[list(columns) + ["season", "gw"]]
+        return rows.reset_index(drop=True)
+
+    def features(self, gameweeks, columns=None):
+        return self._slice(self.X, gameweeks, columns)
+
+    def targets(self, gameweeks, columns=None):
+        return self._slice(self.y, gameweeks, columns)
+
+    def training(self, gameweeks):
+        return self._slice(self.train, gameweeks)
+
+
+_panel = None
+_panel_lock = threading.Lock()
+
+
+def get_panel(reload=False):
+    """
+    Returns the panel shared by the whole process, reading the feature store on first use.
+    Pass reload=True after writing new partitions in the same process.
+    """
+    global _panel
+    with _panel_lock:
+        if _panel is None or reload:
+            _panel = Panel.load()
+    return _panel
+
+
+def set_panel(panel):
+    """Installs an already-loaded panel as this process's shared one, e.g. in a pool worker."""
+    global _panel
+    with _panel_lock:
+        _panel = panel
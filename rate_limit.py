@@ -0,0 +1,150 @@
+"""Shared rate limiting and retries for every outbound fetch.
+
+Each API host gets a token bucket (requests per second plus a burst
+allowance) that all threads draw from, so the element-summary pool can run
+wide without tripping the FPL throttle.  Connection errors, timeouts and
+429/5xx responses are retried with jittered exponential backoff, honouring
+Retry-After when the server sends one; any other error, such as a 404, is
+raised at once.  Every request is sent with
+REQUEST_TIMEOUT, so a stalled connection raises Timeout and is retried like
+any other dropped request instead of blocking its thread forever.
+`limiter.report()` summarises how many requests needed a retry and how many
+were given up on.
+"""
+
+import random
+import threading
+import time
+
+import requests
+
+# host -> (sustained requests per second, burst size)
+HOST_LIMITS = {
+    "fantasy.premierleague.com": (20.0, 20),
+    "understat.com": (2.0, 4),
+}
+
+# (connect, read) seconds passed as `timeout=` to every outbound request
+REQUEST_TIMEOUT = (5, 30)
+
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class RetryableStatus(requests.HTTPError):
+    """Raised for an HTTP status worth retrying (throttled or server-side failure)."""
+
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code} for {response.url}", response=response)
+        self.retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+
+
+def _parse_retry_after(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    """
+    True for failures worth retrying: timeouts, dropped connections and 429/5xx responses,
+    whether raised by check_status or by a client's own raise_for_status. Other HTTP
+    errors, such as a 404 for a page that does not exist, fail on the first attempt.
+    """
+    if isinstance(error, (requests.Timeout, requests.ConnectionError, RetryableStatus)):
+        return True
+    response = getattr(error, "response", None)
+    return (
+        isinstance(error, requests.HTTPError) and response is not None
+        and response.status_code in RETRYABLE_STATUS
+    )
+
+
+def check_status(response):
+    """Raises RetryableStatus for 429/5xx responses so `RateLimiter.call` retries them."""
+    if response.status_code in RETRYABLE_STATUS:
+        raise RetryableStatus(response)
+    return response
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then takes it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    def __init__(self, host_limits=HOST_LIMITS, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_cap=BACKOFF_CAP):
+        self.buckets = {host: TokenBucket(rate, burst) for host, (rate, burst) in host_limits.items()}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.stats = {"requests": 0, "retried": 0, "retries": 0, "gave_up": 0}
+        self.lock = threading.Lock()
+
+    def _count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def _backoff(self, attempt, retry_after=None):
+        # Full jitter: uniform over [0, min(cap, base * 2^attempt)]
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def call(self, host, fetch):
+        """
+        Runs fetch() under host's token bucket, retrying transient failures with backoff
+        (see is_retryable). Re-raises any other error at once, and the last transient
+        one once max_retries is exhausted.
+        """
+        bucket = self.buckets.get(host)
+        self._count("requests")
+
+        for attempt in range(self.max_retries + 1):
+            if bucket is not None:
+                bucket.acquire()
+            try:
+                result = fetch()
+            except requests.RequestException as e:
+                if not is_retryable(e):
+                    raise
+                if attempt == self.max_retries:
+                    self._count("gave_up")
+                    raise
+                if attempt == 0:
+                    self._count("retried")
+                self._count("retries")
+                time.sleep(self._backoff(attempt, getattr(e, "retry_after", None)))
+                continue
+            return result
+
+    def report(self):
+        s = self.stats
+        return (f"{s['requests']} requests, {s['retried']} needed retries "
+                f"({s['retries']} retries total), {s['gave_up']} gave up")
+
+
+limiter = RateLimiter()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""Persistent player identity registry.
+
+Every player gets one stable integer `player_id`, which is the key of all X/y
+files and every join in the pipeline.  FPL element ids cannot play that role
+directly because FPL reassigns them every season, and the X/y files from
+before the registry only carry names.  Each entry therefore records:
+
+  player_id     the registry's own stable id
+  full_name     FPL "first_name second_name"
+  aliases       other spellings seen for the player (e.g. Understat names)
+  fpl_ids       FPL element id per season, e.g. {"2026": 431}
+  understat_id  Understat player id, once matched
+  understat_unmatched
+                key of the Understat candidate set the player last failed to
+                match against (see matching.match_players), so they are only
+                scored again once that set changes
+
+Usage:
+  python registry.py migrate     # add player_id to every X/y file in data/ that lacks it
+"""
+
+import csv
+import json
+import os
+import re
+import sys
+import threading
+
+from atomic import atomic_open
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+REGISTRY_PATH = os.path.join(DATA_DIR, "player_registry.json")
+
+# Understat display name -> FPL full name, applied to Understat data before matching
+UNDERSTAT_ALIASES = {
+    'Alejandro Garnacho': 'Alejandro Garnacho Ferreyra',
+    'Alejandro Jiménez': 'Alex Jiminez Sanchez',
+    'Alisson': 'Alisson Becker',
+    'Altay Bayindir': 'Altay Bayındır',
+    'Amad Diallo Traore': 'Amad Diallo',
+    'André': 'André Trindade da Costa Neto',
+    'Ben White': 'Benjamin White',
+    'Bernardo Silva': 'Bernardo Mota Veiga de Carvalho e Silva',
+    'Bruno Guimarães': 'Bruno Guimarães Rodriguez Moura',
+    'Casemiro': 'Carlos Henrique Casimiro',
+    'Chimuanya Ugochukwu': 'Lesley Ugochukwu',
+    'Dan Ballard': 'Daniel Ballard',
+    'David Raya': 'David Raya Martín',
+    'Diego Gómez': 'Diego Gómez Amarilla',
+    'Diogo Dalot': 'Diogo Dalot Teixeira',
+    'Djordje Petrovic': 'Đorđe Petrović',
+    'Emiliano Martinez': 'Emiliano Martínez Romero',
+    'Evanilson': 'Francisco Evanilson de Lima Barbosa',
+    'Ferdi Kadioglu': 'Ferdi Kadıoğlu',
+    'Florentino Luís': 'Florentino Ibrain Morris Luís',
+    'Gabriel': 'Gabriel dos Santos Magalhães',
+    'Hugo Bueno': 'Hugo Bueno López',
+    'Igor Jesus': 'Igor Jesus Maciel da Cruz',
+    'Iyenoma Destiny Udogie': 'Destiny Udogie',
+    'Jair': 'Jair Paula da Cunha Filho',
+    'Joelinton': 'Joelinton Cássio Apolinário de Lira',
+    'John Victor': 'John Victor Maciel Furtado',
+    'Jorge Cuenca': 'Jorge Cuenca Barreno',
+    'José Sá': 'José Malheiro de Sá',
+    'João Gomes': 'Gustavo Nunes Fernandes Gomes',
+    'João Palhinha': 'João Maria Lobo Alves Palhares Costa Palhinha Gonçalves',
+    'João Pedro': 'João Pedro Junqueira de Jesus',
+    'Lucas Paquetá': 'Lucas Tolentino Coelho de Lima',
+    'Lucas Perri': 'Lucas Estella Perri',
+    'Lucas Pires': 'Lucas Pires Silva',
+    'Marc Cucurella': 'Marc Cucurella Saseta',
+    'Mateus Fernandes': 'Mateus Gonçalo Espanha Fernandes',
+    'Matheus Cunha': 'Matheus Santos Carneiro da Cunha',
+    'Matthew Cash': 'Matty Cash',
+    'Max Kilman': 'Maximilian Kilman',
+    'Moisés Caicedo': 'Moisés Caicedo Corozo',
+    'Morato': 'Felipe Rodrigues Da Silva',
+    'Murillo': 'Murillo Costa dos Santos',
+    'Naif Aguerd': 'Nayef Aguerd',
+    'Nico González': 'Nico González Iglesias',
+    'Oliver Scarles': 'Ollie Scarles',
+    'Pablo': 'Pablo Felipe Pereira de Jesus',
+    'Pedro Neto': 'Pedro Lomba Neto',
+    'Pedro Porro': 'Pedro Porro Sauceda',
+    'Raúl Jiménez': 'Raúl Jiménez Rodríguez',
+    'Reinildo': 'Reinildo Mandava',
+    'Richarlison': 'Richarlison de Andrade',
+    'Rodri': "Rodrigo 'Rodri'Hernandez Cascante",
+    'Rúben Dias': 'Rúben dos Santos Gato Alves Dias',
+    'Santiago Bueno': 'Santiago Ignacio Bueno',
+    'Sasa Lukic': 'Saša Lukić',
+    'Thiago': 'Igor Thiago Nascimento Rodrigues',
+    'Toti': 'Toti Gomes',
+    'Valentino Livramento': 'Tino Livramento',
+    'Yeremi Pino': 'Yéremy Pino Santos',
+    'Yerson Mosquera': 'Yerson Mosquera Valdelamar',
+}
+
+
+class PlayerRegistry:
+    def __init__(self, players=(), next_id=1, path=REGISTRY_PATH):
+        self.path = path
+        self.next_id = next_id
+        self.players = {}
+        self._by_element = {}
+        self._by_name = {}
+        # Collection stages run in parallel threads and share one registry
+        self._lock = threading.RLock()
+        for entry in players:
+            self._add(entry)
+
+    @classmethod
+    def load(cls, path=REGISTRY_PATH):
+        if not os.path.exists(path):
+            return cls(path=path)
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["players"], data["next_id"], path=path)
+
+    def save(self):
+        with self._lock, atomic_open(self.path) as f:
+            json.dump(
+                {"next_id": self.next_id, "players": list(self.players.values())},
+                f, indent=1, ensure_ascii=False,
+            )
+
+    def _add(self, entry):
+        pid = entry["player_id"]
+        self.players[pid] = entry
+        self.next_id = max(self.next_id, pid + 1)
+        for season, element_id in entry["fpl_ids"].items():
+            self._by_element[(season, element_id)] = pid
+        for name in [entry["full_name"], *entry["aliases"]]:
+            ids = self._by_name.setdefault(name, [])
+            if pid not in ids:
+                ids.append(pid)
+
+    def lookup(self, name):
+        """Returns the player_id for a full name or alias, or None."""
+        ids = self._by_name.get(name)
+        return ids[0] if ids else None
+
+    def resolve(self, full_name, season=None, element_id=None):
+        """
+        Returns the player_id for a player, registering them if they are new.
+        A known (season, element_id) wins; otherwise the name is looked up, skipping entries
+        that already hold a different element id this season (two players sharing a name).
+        """
+        with self._lock:
+            return self._resolve(full_name, season, element_id)
+
+    def _resolve(self, full_name, season, element_id):
+        if element_id is not None:
+            element_id = int(element_id)
+            pid = self._by_element.get((season, element_id))
+            if pid is not None:
+                return pid
+
+        for pid in self._by_name.get(full_name, []):
+            entry = self.players[pid]
+            if element_id is None or season not in entry["fpl_ids"]:
+                if element_id is not None:
+                    entry["fpl_ids"][season] = element_id
+                    self._by_element[(season, element_id)] = pid
+                return pid
+
+        entry = {
+            "player_id": self.next_id,
+            "full_name": full_name,
+            "aliases": sorted(u for u, f in UNDERSTAT_ALIASES.items() if f == full_name),
+            "fpl_ids": {} if element_id is None else {season: element_id},
+            "understat_id": None,
+        }
+        self._add(entry)
+        return entry["player_id"]
+
+    def assign_ids(self, df, season=None, element_col="id", name_col="full_name"):
+        """Returns a list of player_ids for the rows of df (element ids are used when present)."""
+        elements = df[element_col].tolist() if element_col in df else [None] * len(df)
+        with self._lock:
+            return [
+                self._resolve(name, season, element_id)
+                for name, element_id in zip(df[name_col].tolist(), elements)
+            ]
+
+    def understat_id(self, player_id):
+        """Returns the Understat id matched to a player_id, or None."""
+        entry = self.players.get(player_id)
+        return entry.get("understat_id") if entry else None
+
+    def set_understat_ids(self, player_ids, understat_ids):
+        with self._lock:
+            for pid, uid in zip(player_ids, understat_ids):
+                if uid is not None and uid == uid and pid in self.players:
+                    self.players[pid]["understat_id"] = str(uid)
+                    self.players[pid].pop("understat_unmatched", None)
+
+    def unmatched_key(self, player_id):
+        """Returns the candidate-set key a player last failed to match against, or None."""
+        entry = self.players.get(player_id)
+        return entry.get("understat_unmatched") if entry else None
+
+    def set_unmatched(self, player_ids, key):
+        with self._lock:
+            for pid in player_ids:
+                if pid in self.players:
+                    self.players[pid]["understat_unmatched"] = key
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Returns the registry shared by the whole process, loading it from disk on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PlayerRegistry.load()
+    return _registry
+
+
+def migrate(data_dir=DATA_DIR):
+    """
+    Adds a player_id column (looked up or registered by name) to every X/y file in data_dir
+    that lacks one. Rows are rewritten as text so the other columns stay byte-for-byte the same.
+    """
+    registry = get_registry()
+    pattern = re.compile(r"^(X|y)_(\d+)\.csv$")
+
+    for f in sorted(os.listdir(data_dir), key=lambda f: (len(f), f)):
+        if not pattern.match(f):
+            continue
+        path = os.path.join(data_dir, f)
+        with open(path, newline="") as fh:
+            rows = list(csv.reader(fh))
+        header = rows[0]
+        if "player_id" in header:
+            continue
+
+        name_idx = header.index("full_name")
+        out = [["player_id", *header]]
+        for row in rows[1:]:
+            out.append([str(registry.resolve(row[name_idx])), *row])
+
+        with open(path, "w", newline="") as fh:
+            csv.writer(fh, lineterminator="\n").writerows(out)
+        print(f"  {f}: added player_id to {len(rows) - 1} rows")
+
+    registry.save()
+    print(f"Registry: {len(registry.players)} players ({registry.path})")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print(__doc__)
+        sys.exit(1)
+    migrate()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Record and replay the FPL/Understat payloads behind a collection run.
+
+A recording is a plain directory of JSON files, one per endpoint, laid out by
+URL path (FPL) or cache key (Understat):
+
+    <dir>/api/bootstrap-static.json
+    <dir>/api/element-summary/123.json
+    <dir>/understat/league/EPL/2026.json
+
+Modes are picked with environment variables so every script (data_v3.py,
+preseason.py, backfill.py) gets them without extra flags:
+
+  FPL_ORACLE_RECORD=<dir>   save every payload the run uses into <dir>
+  FPL_ORACLE_REPLAY=<dir>   serve every payload from <dir>; never touch the network
+  FPL_ORACLE_SERVER=<url>   send FPL and Understat requests to a stand-in server
+
+Usage:
+  FPL_ORACLE_RECORD=runs/gw10 python data_v3.py
+  FPL_ORACLE_REPLAY=runs/gw10 python backfill.py
+  python replay.py serve runs/gw10 [--port 8765]
+  FPL_ORACLE_SERVER=http://127.0.0.1:8765 python preseason.py
+"""
+
+import hashlib
+import json
+import os
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+from atomic import atomic_open
+
+RECORD_DIR = os.environ.get("FPL_ORACLE_RECORD")
+REPLAY_DIR = os.environ.get("FPL_ORACLE_REPLAY")
+SERVER_URL = os.environ.get("FPL_ORACLE_SERVER", "").rstrip("/") or None
+
+DEFAULT_PORT = 8765
+
+
+def key_for_url(url):
+    """Maps a request URL to its recording key, e.g. .../api/fixtures/ -> api/fixtures."""
+    return unquote(urlparse(url).path).strip("/")
+
+
+class Recording:
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, *key.strip("/").split("/")) + ".json"
+
+    def has(self, key):
+        return os.path.exists(self.path(key))
+
+    def load(self, key):
+        path = self.path(key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{key} is not in the recording at {self.root}")
+        with open(path) as f:
+            return json.load(f)
+
+    def save(self, key, body):
+        with atomic_open(self.path(key)) as f:
+            json.dump(body, f)
+
+
+recorder = Recording(RECORD_DIR) if RECORD_DIR else None
+player = Recording(REPLAY_DIR) if REPLAY_DIR else None
+
+
+def serve(root, port=DEFAULT_PORT):
+    """Serves a recording over HTTP, with ETags so conditional requests get 304s."""
+    recording = Recording(root)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            key = key_for_url(self.path)
+            if not recording.has(key):
+                self.send_error(404, f"{key} not recorded")
+                return
+
+            with open(recording.path(key), "rb") as f:
+                content = f.read()
+            etag = '"' + hashlib.sha1(content).hexdigest() + '"'
+
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"Serving {root} on http://127.0.0.1:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "serve":
+        print(__doc__)
+        sys.exit(1)
+
+    port = int(sys.argv[sys.argv.index("--port") + 1]) if "--port" in sys.argv else DEFAULT_PORT
+    serve(sys.argv[2], port)
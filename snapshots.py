@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""Archive of the raw payloads behind each collection run, for offline rebuilds.
+
+Every payload a run uses (bootstrap-static, fixtures, element summaries, event
+live, Understat) is stored once as gzip-compressed JSON named by the SHA-256
+of its content:
+
+    data/snapshots/objects/3f/3fa4...c1.json.gz
+
+and the run writes one manifest per gameweek mapping payload keys (the same
+keys replay.py uses) to those hashes:
+
+    data/snapshots/2026/gw10.json
+
+Payloads that did not change between runs, such as finished fixtures or an
+unchanged Understat page, share one object.  A Snapshot has the same
+has/load/save interface as replay.Recording, so the response cache archives
+into it during a run and serves from it during a rebuild.
+
+Usage:
+  python snapshots.py list
+  python snapshots.py rebuild <season> <gw|first-last|all>   # recompute X/y with no network
+"""
+
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from datetime import datetime
+
+import feature_store
+from atomic import atomic_open
+from fpl_api import fpl
+from http_cache import cache
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "snapshots")
+
+
+class Snapshot:
+    def __init__(self, season, gameweeks=(), builder="data_v3", payloads=None, root=SNAPSHOT_DIR):
+        self.season = str(season)
+        self.gameweeks = list(gameweeks)
+        self.builder = builder
+        self.payloads = dict(payloads or {})
+        self.root = root
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, season, gameweek, root=SNAPSHOT_DIR):
+        path = manifest_path(season, gameweek, root)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No snapshot for season {season} GW {gameweek} ({path})")
+        with open(path) as f:
+            manifest = json.load(f)
+        return cls(season, [gameweek], manifest["builder"], manifest["payloads"], root)
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}.json.gz")
+
+    def has(self, key):
+        return key in self.payloads
+
+    def understat_teams(self, season=None):
+        """Returns the Understat team names whose pages this snapshot holds for a season (its own by default)."""
+        suffix = f"/{season or self.season}"
+        return sorted(
+            key[len("understat/team/"):-len(suffix)] for key in self.payloads
+            if key.startswith("understat/team/") and key.endswith(suffix)
+        )
+
+    def load(self, key):
+        digest = self.payloads.get(key)
+        if digest is None:
+            raise FileNotFoundError(f"{key} is not in the {self.season} snapshot")
+        with gzip.open(self._object_path(digest), "rt") as f:
+            return json.load(f)
+
+    def _write_object(self, digest, content):
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            with atomic_open(path, "wb") as f:
+                f.write(gzip.compress(content, mtime=0))
+
+    def save(self, key, body):
+        content = json.dumps(body, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            self.payloads[key] = digest
+            if not self.gameweeks:
+                # No manifest would point at it yet; flush writes it once there is one
+                self._pending[digest] = content
+                return
+        self._write_object(digest, content)
+
+    def flush(self):
+        """
+        Writes the manifest of every gameweek this snapshot covers. Payloads already in an
+        existing manifest are kept unless this run fetched them again, so a run resumed from
+        checkpoints (see checkpoints.py) still leaves a complete snapshot. A run that ends
+        with no gameweeks writes nothing, so it leaves no unreferenced objects behind.
+        """
+        with self._lock:
+            payloads = dict(self.payloads)
+            pending, self._pending = self._pending, {}
+        if not self.gameweeks:
+            return
+        for digest, content in pending.items():
+            self._write_object(digest, content)
+
+        for gw in self.gameweeks:
+            path = manifest_path(self.season, gw, self.root)
+            merged = {}
+            if os.path.exists(path):
+                with open(path) as f:
+                    merged = json.load(f)["payloads"]
+            merged.update(payloads)
+
+            manifest = {
+                "season": self.season,
+                "gameweek": gw,
+                "builder": self.builder,
+                "created_at": datetime.now().isoformat(),
+                "payloads": dict(sorted(merged.items())),
+            }
+            with atomic_open(path) as f:
+                json.dump(manifest, f, indent=1)
+
+
+def manifest_path(season, gameweek, root=SNAPSHOT_DIR):
+    return os.path.join(root, str(season), f"gw{int(gameweek)}.json")
+
+
+def archive_run(season, gameweeks=(), builder="data_v3"):
+    """
+    Archives every payload this process uses from now on. The manifests are written at exit
+    for the snapshot's gameweeks, which the caller can fill in once it knows them; payloads
+    fetched before then are held in memory and dropped if the run never sets any.
+    """
+    snapshot = Snapshot(season, gameweeks, builder)
+    cache.archive = snapshot
+    atexit.register(snapshot.flush)
+    return snapshot
+
+
+def archived_gameweeks(season, root=SNAPSHOT_DIR):
+    season_dir = os.path.join(root, str(season))
+    if not os.path.isdir(season_dir):
+        return []
+    return sorted(
+        int(m.group(1)) for m in (re.match(r"^gw(\d+)\.json$", f) for f in os.listdir(season_dir)) if m
+    )
+
+
+def rebuild(season, gameweek, root=SNAPSHOT_DIR):
+    """Recomputes a gameweek's feature-store rows from its snapshot without touching the network."""
+    snapshot = Snapshot.open(season, gameweek, root)
+    cache.player = snapshot
+    fpl.clear()
+    try:
+        if snapshot.builder == "preseason":
+            import preseason
+            # Pre-season features use the previous season's Understat stats
+            shared = preseason.load_shared_data(
+                season, snapshot.understat_teams(str(int(season) - 1))
+            )
+            X = preseason.build_preseason_x(gameweek, shared)
+            feature_store.write("X", X, season, gameweek)
+            print(f"  GW {gameweek}: X {len(X)} rows")
+        else:
+            import data_v3
+            data_v3.set_current_gameweek(gameweek)
+            X, y = data_v3.collect_gameweek(
+                gameweek, season=season, understat_teams=snapshot.understat_teams()
+            )
+            feature_store.write("X", X, season, gameweek)
+            if y is None:
+                print(f"  GW {gameweek}: X {len(X)} rows")
+            else:
+                feature_store.write("y", y, season, gameweek - 1)
+                print(f"  GW {gameweek}: X {len(X)} rows, y (GW {gameweek - 1}) {len(y)} rows")
+    finally:
+        cache.player = None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2 and sys.argv[1] == "list":
+        for season in sorted(os.listdir(SNAPSHOT_DIR)) if os.path.isdir(SNAPSHOT_DIR) else []:
+            if season != "objects":
+                print(f"{season}: {archived_gameweeks(season)}")
+    elif len(sys.argv) == 4 and sys.argv[1] == "rebuild":
+        season, spec = sys.argv[2], sys.argv[3]
+        if spec == "all":
+            gws = archived_gameweeks(season)
+        else:
+            first, _, last = spec.partition("-")
+            gws = range(int(first), int(last or first) + 1)
+        for gw in gws:
+            rebuild(season, gw)
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,57 @@
+"""Runs a pipeline of named stages concurrently, in dependency order.
+
+A stage is a (name, deps, compute) triple: compute(done) receives the dict of
+finished stage outputs and may only read the stages named in deps.  Every
+stage whose dependencies are finished is started straight away on a thread
+pool, so independent fetches overlap and a merge starts as soon as its inputs
+are ready.  The stages are I/O bound (API and Understat requests), which is
+why threads are enough.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Max stages running at once
+STAGE_WORKERS = 6
+
+
+def _run_stage(name, compute, done, checkpoints):
+    start = time.perf_counter()
+    if checkpoints is None:
+        result = compute(done)
+    else:
+        result = checkpoints.run(name, lambda: compute(done))
+    return result, time.perf_counter() - start
+
+
+def run_stages(stages, checkpoints=None, max_workers=STAGE_WORKERS):
+    """
+    Runs the stages and returns {name: output}. With a checkpoints.Checkpoints each stage
+    is resumed from or saved to its checkpoint. If a stage fails, stages already running
+    are allowed to finish (and checkpoint) before the error is raised.
+    """
+    pending = {name: (deps, compute) for name, deps, compute in stages}
+    unknown = {d for deps, _ in pending.values() for d in deps} - set(pending)
+    if unknown:
+        raise ValueError(f"Unknown stage dependencies: {sorted(unknown)}")
+
+    done = {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            for name, (deps, compute) in list(pending.items()):
+                if all(d in done for d in deps):
+                    del pending[name]
+                    future = pool.submit(_run_stage, name, compute, dict(done), checkpoints)
+                    running[future] = name
+
+            if not running:
+                raise ValueError(f"Stages with a dependency cycle: {sorted(pending)}")
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                done[name], seconds = future.result()
+                print(f"  {name}: {seconds:.1f}s")
+
+    return done
@@ -0,0 +1,99 @@
+"""Shared fixtures: a small synthetic season served from a snapshot instead of the network."""
+
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_v3  # noqa: E402
+import registry  # noqa: E402
+from fpl_api import fpl  # noqa: E402
+from http_cache import cache  # noqa: E402
+
+TEAMS = ["Arsenal", "Aston Villa", "Bournemouth", "Brentford", "Brighton", "Chelsea",
+         "Crystal Palace", "Everton", "Fulham", "Liverpool"]
+FIRST = ["Bukayo", "Mo", "Erling", "Cole", "Bruno", "Ollie", "Jarrod", "Dominic", "Declan", "Phil"]
+LAST = ["Saka", "Salah", "Haaland", "Palmer", "Fernandes", "Watkins", "Bowen", "Solanke", "Rice", "Foden"]
+
+
+def season_payloads(season, gameweek, n_players=40):
+    """
+    Returns {snapshot key: payload} for a made-up season in progress at `gameweek`:
+    bootstrap-static, fixtures, element summaries, the previous gameweek's live points
+    and the Understat league and team pages.
+    """
+    rng = random.Random(0)
+    players = [{
+        "id": i + 1, "first_name": FIRST[i % 10], "second_name": f"{LAST[i // 4 % 10]}{i}",
+        "team": i % len(TEAMS) + 1, "element_type": i % 4 + 1, "now_cost": 50 + i,
+        "influence": "100.0", "creativity": "10.0", "threat": "20.0", "ict_index": "30.0",
+        "penalties_order": 1 if i % 9 == 0 else None, "selected_by_percent": "5.3",
+    } for i in range(n_players)]
+    bootstrap = {
+        "teams": [{"id": i + 1, "name": n, "short_name": n[:3].upper(), "position": i + 1}
+                  for i, n in enumerate(TEAMS)],
+        "elements": players,
+        "events": [{"id": g, "is_next": g == gameweek + 1, "is_current": g == gameweek,
+                    "finished": g < gameweek} for g in range(1, 39)],
+        "element_types": [{"id": 1, "singular_name": "Goalkeeper"}, {"id": 2, "singular_name": "Defender"},
+                          {"id": 3, "singular_name": "Midfielder"}, {"id": 4, "singular_name": "Forward"}],
+    }
+
+    fixtures = []
+    for g in range(1, 39):
+        order = list(range(1, len(TEAMS) + 1))
+        rng.shuffle(order)
+        for k in range(len(TEAMS) // 2):
+            finished = g < gameweek
+            fixtures.append({
+                "id": len(fixtures) + 1, "event": g, "team_h": order[2 * k], "team_a": order[2 * k + 1],
+                "finished": finished,
+                "team_h_score": rng.randint(0, 3) if finished else None,
+                "team_a_score": rng.randint(0, 3) if finished else None,
+                "kickoff_time": f"{int(season) - 1}-08-{g % 28 + 1:02d}T15:00:00Z",
+            })
+
+    payloads = {"api/bootstrap-static": bootstrap, "api/fixtures": fixtures}
+    for p in players:
+        payloads[f"api/element-summary/{p['id']}"] = {"history": [{
+            "round": g, "minutes": 90, "total_points": rng.randint(0, 10), "expected_goals": "0.3",
+            "clearances_blocks_interceptions": 2, "tackles": 1, "element": p["id"],
+        } for g in range(1, gameweek)]}
+    payloads[f"api/event/{gameweek - 1}/live"] = {"elements": [
+        {"id": p["id"], "stats": {"total_points": rng.randint(0, 10), "minutes": 90}} for p in players
+    ]}
+    payloads[f"understat/league/EPL/{season}"] = [{
+        "id": str(p["id"] + 1000), "player_name": f"{p['first_name']} {p['second_name']}",
+        "time": "900", "games": "10", "xG": "2.5", "xA": "1.1", "yellow_cards": "1", "red_cards": "0",
+        "team_title": TEAMS[p["team"] - 1], "position": "F M",
+    } for p in players]
+    for team in TEAMS:
+        payloads[f"understat/team/{team}/{season}"] = [{
+            "datetime": f"{int(season) - 1}-09-{d:02d} 15:00:00", "isResult": True,
+            "side": "h" if d % 2 else "a", "xG": {"h": "1.2", "a": "0.8"},
+        } for d in range(1, gameweek)]
+    return payloads
+
+
+@pytest.fixture
+def player_registry(tmp_path, monkeypatch):
+    """An empty registry under tmp_path, installed as the process-wide one."""
+    reg = registry.PlayerRegistry(path=str(tmp_path / "player_registry.json"))
+    monkeypatch.setattr(registry, "_registry", reg)
+    return reg
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    """Keeps each test's fetches, pinned gameweek and cached payloads to itself."""
+    monkeypatch.setattr(cache, "cache_dir", None)
+    monkeypatch.setattr(cache, "recorder", None)
+    monkeypatch.setattr(cache, "player", None)
+    monkeypatch.setattr(cache, "archive", None)
+    monkeypatch.setattr(data_v3, "_curr_gameweek", None)
+    fpl.clear()
+    yield
+    fpl.clear()
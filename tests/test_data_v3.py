@@ -0,0 +1,23 @@
+import data_v3
+from http_cache import cache
+
+
+class Payloads(dict):
+    """Serves fixed payloads the way replay.Recording does."""
+
+    def load(self, key):
+        return self[key]
+
+
+def test_understat_teams_with_only_unplayed_fixtures_is_empty(monkeypatch):
+    unplayed = [{"datetime": "2099-08-16 15:00:00", "isResult": False, "side": "h",
+                 "xG": {"h": None, "a": None}}]
+    teams = ["Arsenal", "Chelsea"]
+    monkeypatch.setattr(cache, "player", Payloads(
+        {f"understat/team/{team}/2026": unplayed for team in teams}
+    ))
+
+    df = data_v3.get_understat_teams("2026", teams)
+
+    assert df.empty
+    assert list(df.columns) == ['team_name', 'team_xg_per_90', 'team_xg_against_per_90', 'matches_played']
@@ -0,0 +1,22 @@
+import snapshots
+from fpl_api import FPL_API_URL
+from http_cache import cache
+from replay import Recording
+
+
+def test_replayed_payloads_are_archived(tmp_path, monkeypatch):
+    recording = Recording(str(tmp_path / "recording"))
+    recording.save("api/bootstrap-static", {"events": []})
+    recording.save("understat/league/EPL/2026", [{"id": "1"}])
+    root = str(tmp_path / "snapshots")
+    archive = snapshots.Snapshot("2026", [10], root=root)
+    monkeypatch.setattr(cache, "player", recording)
+    monkeypatch.setattr(cache, "archive", archive)
+
+    cache.get_json(f"{FPL_API_URL}/bootstrap-static/")
+    cache.cached("understat/league/EPL/2026", fetch=None)
+    archive.flush()
+
+    snapshot = snapshots.Snapshot.open("2026", 10, root=root)
+    assert snapshot.load("api/bootstrap-static") == {"events": []}
+    assert snapshot.load("understat/league/EPL/2026") == [{"id": "1"}]
@@ -0,0 +1,38 @@
+import pytest
+import requests
+
+from rate_limit import RateLimiter
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    response.url = "https://understat.com/team/Nowhere/2026"
+    return requests.HTTPError(f"{status} Client Error", response=response)
+
+
+def failing(error, attempts):
+    def fetch():
+        attempts.append(1)
+        raise error
+    return fetch
+
+
+def test_404_is_not_retried():
+    limiter, attempts = RateLimiter(host_limits={}), []
+
+    with pytest.raises(requests.HTTPError):
+        limiter.call(None, failing(http_error(404), attempts))
+
+    assert len(attempts) == 1
+    assert limiter.stats["retries"] == 0
+
+
+def test_503_is_retried(monkeypatch):
+    monkeypatch.setattr("rate_limit.time.sleep", lambda s: None)
+    limiter, attempts = RateLimiter(host_limits={}, max_retries=2), []
+
+    with pytest.raises(requests.HTTPError):
+        limiter.call(None, failing(http_error(503), attempts))
+
+    assert len(attempts) == 3
@@ -0,0 +1,29 @@
+import feature_store
+import snapshots
+from conftest import season_payloads
+from data_v3 import UNDERSTAT_SEASON
+
+
+def test_rebuild_of_past_season_keeps_current_season_fpl_ids(tmp_path, monkeypatch, player_registry):
+    season, gameweek = str(int(UNDERSTAT_SEASON) - 1), 5
+    payloads = season_payloads(season, gameweek)
+
+    # The same players already known this season under different element ids
+    for p in payloads["api/bootstrap-static"]["elements"]:
+        player_registry._resolve(f"{p['first_name']} {p['second_name']}", UNDERSTAT_SEASON, p["id"] + 500)
+    current_before = {pid: e["fpl_ids"].get(UNDERSTAT_SEASON) for pid, e in player_registry.players.items()}
+
+    root = str(tmp_path / "snapshots")
+    snapshot = snapshots.Snapshot(season, [gameweek], root=root)
+    for key, body in payloads.items():
+        snapshot.save(key, body)
+    snapshot.flush()
+
+    written = {}
+    monkeypatch.setattr(feature_store, "write", lambda kind, df, *a, **k: written.setdefault(kind, df))
+    snapshots.rebuild(season, gameweek, root=root)
+
+    current_after = {pid: e["fpl_ids"].get(UNDERSTAT_SEASON) for pid, e in player_registry.players.items()}
+    assert current_after == current_before
+    assert set(written["X"]["player_id"]) <= set(current_before)
+    assert len(written["X"]) > 0